@@ -0,0 +1,384 @@
+from __future__ import annotations
+import os
+import sys
+import json
+import argparse
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from importacion_perezosa import ModuloPerezoso
+
+np = ModuloPerezoso("numpy")
+
+VERSION_ALMACEN = 1
+
+# Columnas del almacén: nombre del archivo y tipo de sus elementos (little-endian, para que el archivo sea el mismo en
+# cualquier máquina)
+COLUMNAS = {"hashes": "<u8", "ids": "<u4", "rutas": "u1", "finales": "<u8"}
+
+
+class AlmacenHashes:
+    """
+    Almacén binario de pHash en un directorio, pensado para corpus de millones de imágenes.
+
+    Cada entrada ocupa 12 bytes en dos columnas de ancho fijo: el hash (uint64, mismo orden de bits que el hexadecimal
+    de imagehash) y el id del archivo (uint32). Las rutas se guardan una sola vez en una tabla aparte: sus bytes UTF-8
+    concatenados ("rutas") y la posición donde termina cada una ("finales", uint64), así la ruta del id i está entre
+    finales[i - 1] y finales[i].
+    Las columnas se abren todas juntas con np.memmap en modo lectura al leer almacen.json, así que varios procesos que
+    abren el mismo almacén comparten una sola copia en la cache de páginas del sistema en lugar de cargar un ImageHash
+    por imagen en cada uno. Al enviar el almacén a otro proceso (ej: un pool) solo viaja el directorio y el proceso lo
+    vuelve a mapear.
+
+    Agregar escribe al final de las columnas y recién después actualiza almacen.json con las cantidades, así un corte a
+    mitad de camino no deja el almacén inconsistente (los bytes sobrantes se descartan al agregar de nuevo). Si se
+    agrega una ruta que ya estaba (el archivo cambió), la entrada nueva reemplaza a la anterior, que queda ocupando
+    lugar hasta compactar(). compactar() escribe las columnas en archivos nuevos (otra generación) y cambia almacen.json
+    de una vez, sin tocar los archivos de la generación anterior, así los procesos que la tienen mapeada pueden seguir
+    leyéndola hasta que llamen a recargar(). Los archivos de generaciones anteriores se borran con limpiar(), cuando ya
+    no hay procesos que las lean.
+    Se admite un solo proceso que escribe a la vez.
+    """
+
+    def __init__(self, directorio: str):
+        """
+        Abre el almacén del directorio, o lo crea vacío si no existe.
+        :param directorio: Directorio del almacén.
+        """
+        self.directorio = directorio
+        self._metadatos = None
+        self._columnas = {}
+        self._vigentes = None
+        self._idsPorRuta = None
+        os.makedirs(directorio, exist_ok=True)
+        if not os.path.exists(self._ruta_metadatos()):
+            for columna in COLUMNAS:
+                open(self._ruta_columna(columna, 0), "wb").close()
+            self._guardar_metadatos({"version": VERSION_ALMACEN, "generacion": 0, "entradas": 0, "rutas": 0,
+                                     "bytes_rutas": 0, "compacto": True})
+            self._mapear_columnas()
+
+    def __getstate__(self):
+        # Los mapas de memoria no se copian: el proceso que recibe el almacén vuelve a mapear los mismos archivos
+        return {"directorio": self.directorio}
+
+    def __setstate__(self, estado):
+        self.directorio = estado["directorio"]
+        self._metadatos = None
+        self._columnas = {}
+        self._vigentes = None
+        self._idsPorRuta = None
+
+    def __len__(self) -> int:
+        # Cada ruta tiene al menos una entrada y solo cuenta la última, así que hay tantas vigentes como rutas
+        return self.metadatos["rutas"]
+
+    def _ruta_metadatos(self) -> str:
+        return os.path.join(self.directorio, "almacen.json")
+
+    def _ruta_columna(self, columna: str, generacion: int) -> str:
+        return os.path.join(self.directorio, f"{columna}-{generacion}.bin")
+
+    def _guardar_metadatos(self, metadatos: dict) -> None:
+        temporal = f"{self._ruta_metadatos()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(metadatos, archivo)
+        os.replace(temporal, self._ruta_metadatos())
+        self._metadatos = metadatos
+
+    @property
+    def metadatos(self) -> dict:
+        if self._metadatos is None:
+            with open(self._ruta_metadatos(), encoding="utf-8") as archivo:
+                metadatos = json.load(archivo)
+            if metadatos.get("version") != VERSION_ALMACEN:
+                raise ValueError(f"Versión de almacén no soportada: {metadatos.get('version')}")
+            self._metadatos = metadatos
+            self._mapear_columnas()
+        return self._metadatos
+
+    def recargar(self) -> None:
+        """
+        Vuelve a leer almacen.json y a mapear las columnas, para ver lo que agregó o compactó otro proceso.
+        """
+        self._metadatos = None
+        self._columnas = {}
+        self._vigentes = None
+        self._idsPorRuta = None
+
+    def _cantidad(self, columna: str) -> int:
+        metadatos = self.metadatos
+        if columna in ("hashes", "ids"):
+            return metadatos["entradas"]
+        if columna == "finales":
+            return metadatos["rutas"]
+        return metadatos["bytes_rutas"]
+
+    def _mapear_columnas(self) -> None:
+        # Todas las columnas se mapean juntas, apenas se leen los metadatos: si se mapearan recién al usarlas, un
+        # compactar() de otro proceso entre medio podría dejar mezcladas columnas de dos generaciones
+        generacion = self._metadatos["generacion"]
+        columnas = {}
+        for columna, tipo in COLUMNAS.items():
+            cantidad = self._cantidad(columna)
+            if cantidad == 0:
+                # np.memmap no puede mapear un archivo vacío
+                columnas[columna] = np.zeros(0, dtype=tipo)
+            else:
+                columnas[columna] = np.memmap(self._ruta_columna(columna, generacion), dtype=tipo, mode="r",
+                                              shape=(cantidad,))
+        self._columnas = columnas
+
+    def _columna(self, columna: str) -> np.ndarray:
+        # Leer los metadatos (si hace falta) mapea todas las columnas
+        self.metadatos
+        return self._columnas[columna]
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """
+        Columna de hashes de todas las entradas, incluidas las reemplazadas (ver vigentes()).
+        """
+        return self._columna("hashes")
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._columna("ids")
+
+    def ruta(self, idArchivo: int) -> str:
+        finales = self._columna("finales")
+        inicio = int(finales[idArchivo - 1]) if idArchivo > 0 else 0
+        return bytes(self._columna("rutas")[inicio:int(finales[idArchivo])]).decode("utf-8")
+
+    def rutas(self) -> Iterator[str]:
+        for idArchivo in range(len(self)):
+            yield self.ruta(idArchivo)
+
+    def vigentes(self) -> Optional[np.ndarray]:
+        """
+        Posiciones de las entradas vigentes (la última de cada id), en orden, o None si todas lo son (el almacén está
+        compacto o nunca se reemplazó una ruta).
+        """
+        if self.metadatos["compacto"]:
+            return None
+        if self._vigentes is None:
+            ids = np.asarray(self.ids)
+            # La última aparición de cada id es la primera en el array invertido
+            _, primeras = np.unique(ids[::-1], return_index=True)
+            self._vigentes = np.sort(len(ids) - 1 - primeras)
+        return self._vigentes
+
+    def buscar(self, valor: int, limite: int = 10,
+               tamanoBloque: int = 1 << 20) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Busca las entradas vigentes cuyo hash está a distancia de Hamming <= limite de valor.
+        Recorre la columna de hashes por bloques con XOR + bitwise_count, así la memoria extra depende de tamanoBloque
+        y no del tamaño del almacén.
+        :return: Por cada bloque con resultados, una tupla (posiciones, distancias) de arrays.
+        """
+        hashes = self.hashes
+        vigentes = self.vigentes()
+        consulta = np.uint64(valor)
+        for inicio in range(0, len(hashes), tamanoBloque):
+            distancias = np.bitwise_count(hashes[inicio:inicio + tamanoBloque] ^ consulta)
+            cercanos = distancias <= limite
+            if vigentes is not None:
+                fin = inicio + len(distancias)
+                enBloque = vigentes[np.searchsorted(vigentes, inicio):np.searchsorted(vigentes, fin)]
+                mascara = np.zeros(len(distancias), dtype=bool)
+                mascara[enBloque - inicio] = True
+                cercanos &= mascara
+            posiciones = np.flatnonzero(cercanos)
+            if len(posiciones):
+                yield posiciones + inicio, distancias[posiciones]
+
+    def _ids_por_ruta(self) -> dict:
+        # Solo lo necesita el proceso que agrega; los que leen no cargan las rutas en memoria
+        if self._idsPorRuta is None:
+            self._idsPorRuta = {ruta: idArchivo for idArchivo, ruta in enumerate(self.rutas())}
+        return self._idsPorRuta
+
+    def __contains__(self, ruta: str) -> bool:
+        return ruta in self._ids_por_ruta()
+
+    def agregar(self, rutas: Sequence[str], hashes: Sequence[int]) -> None:
+        """
+        Agrega entradas al final del almacén. Las rutas que ya estaban conservan su id y su entrada anterior queda
+        reemplazada por la nueva.
+        :param rutas: Rutas de las imágenes.
+        :param hashes: pHash de cada ruta como entero de 64 bits (o array uint64).
+        """
+        if len(rutas) != len(hashes):
+            raise ValueError(f"Cantidad de rutas y de hashes distinta: {len(rutas)} y {len(hashes)}")
+        if not len(rutas):
+            return
+        metadatos = dict(self.metadatos)
+        idsPorRuta = self._ids_por_ruta()
+        bytesRutas = metadatos["bytes_rutas"]
+        ids = np.empty(len(rutas), dtype=COLUMNAS["ids"])
+        nuevas = []
+        finales = []
+        reemplaza = False
+        for posicion, ruta in enumerate(rutas):
+            idArchivo = idsPorRuta.get(ruta)
+            if idArchivo is None:
+                idArchivo = metadatos["rutas"] + len(nuevas)
+                idsPorRuta[ruta] = idArchivo
+                codificada = ruta.encode("utf-8")
+                nuevas.append(codificada)
+                bytesRutas += len(codificada)
+                finales.append(bytesRutas)
+            else:
+                reemplaza = True
+            ids[posicion] = idArchivo
+
+        datos = {
+            "hashes": np.asarray(hashes, dtype=np.uint64).astype(COLUMNAS["hashes"]).tobytes(),
+            "ids": ids.tobytes(),
+            "rutas": b"".join(nuevas),
+            "finales": np.array(finales, dtype=COLUMNAS["finales"]).tobytes(),
+        }
+        for columna, contenido in datos.items():
+            ruta = self._ruta_columna(columna, metadatos["generacion"])
+            tamano = self._cantidad(columna) * np.dtype(COLUMNAS[columna]).itemsize
+            with open(ruta, "r+b") as archivo:
+                # Se descartan los bytes de un agregado anterior que no llegó a actualizar almacen.json (solo si los
+                # hay: en Windows no se puede truncar un archivo mapeado)
+                if os.path.getsize(ruta) != tamano:
+                    archivo.truncate(tamano)
+                archivo.seek(tamano)
+                archivo.write(contenido)
+
+        metadatos["entradas"] += len(rutas)
+        metadatos["rutas"] += len(nuevas)
+        metadatos["bytes_rutas"] = bytesRutas
+        metadatos["compacto"] = metadatos["compacto"] and not reemplaza
+        self._guardar_metadatos(metadatos)
+        self._mapear_columnas()
+        self._vigentes = None
+
+    def agregar_imagenes(self, pathsImagenes: Iterable[str], workers: Optional[int] = None,
+                         omitirExistentes: bool = True, tamanoLote: int = 10000) -> int:
+        """
+        Calcula el pHash de las imágenes (ver deduplicacion.hashear_corpus) y las agrega de a lotes.
+        :param omitirExistentes: Si es True no se vuelven a hashear las rutas que ya están en el almacén. Con False
+        se recalculan y reemplazan (ej: si los archivos cambiaron).
+        :return: Cantidad de imágenes agregadas.
+        """
+        agregadas = 0
+        lote = []
+        for path in pathsImagenes:
+            if omitirExistentes and path in self:
+                continue
+            lote.append(path)
+            if len(lote) >= tamanoLote:
+                agregadas += self._agregar_lote(lote, workers)
+                lote = []
+        if lote:
+            agregadas += self._agregar_lote(lote, workers)
+        return agregadas
+
+    def _agregar_lote(self, lote: List[str], workers: Optional[int]) -> int:
+        from deduplicacion import hashear_corpus
+        rutas, hashes = hashear_corpus(lote, workers)
+        self.agregar(rutas, hashes)
+        return len(rutas)
+
+    def compactar(self, conservar: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Reescribe el almacén con una sola entrada por ruta (la vigente), sin las reemplazadas. Los archivos de la
+        generación anterior quedan para los procesos que todavía la leen (ver limpiar()).
+        :param conservar: Si se indica, solo se conservan las rutas para las que devuelve True (ej: os.path.exists
+        para quitar las imágenes borradas).
+        :return: Cantidad de entradas que quedaron.
+        """
+        metadatos = self.metadatos
+        vigentes = self.vigentes()
+        posiciones = np.arange(metadatos["entradas"]) if vigentes is None else vigentes
+        ids = self.ids
+        generacion = metadatos["generacion"] + 1
+
+        conservadas = []
+        bytesRutas = 0
+        with open(self._ruta_columna("rutas", generacion), "wb") as archivoRutas:
+            finales = []
+            for posicion in posiciones:
+                ruta = self.ruta(int(ids[posicion]))
+                if conservar is not None and not conservar(ruta):
+                    continue
+                codificada = ruta.encode("utf-8")
+                archivoRutas.write(codificada)
+                bytesRutas += len(codificada)
+                finales.append(bytesRutas)
+                conservadas.append(posicion)
+        conservadas = np.array(conservadas, dtype=np.int64)
+        columnas = {
+            "hashes": np.asarray(self.hashes)[conservadas].astype(COLUMNAS["hashes"]),
+            "ids": np.arange(len(conservadas), dtype=COLUMNAS["ids"]),
+            "finales": np.array(finales, dtype=COLUMNAS["finales"]),
+        }
+        for columna, valores in columnas.items():
+            with open(self._ruta_columna(columna, generacion), "wb") as archivo:
+                archivo.write(valores.tobytes())
+
+        self._guardar_metadatos({"version": VERSION_ALMACEN, "generacion": generacion,
+                                 "entradas": len(conservadas), "rutas": len(conservadas),
+                                 "bytes_rutas": bytesRutas, "compacto": True})
+        self._mapear_columnas()
+        self._vigentes = None
+        self._idsPorRuta = None
+        return len(conservadas)
+
+    def limpiar(self) -> int:
+        """
+        Borra los archivos de las generaciones anteriores a la actual que dejó compactar(). Hay que llamarlo cuando ya
+        no quedan procesos leyendo esas generaciones: los archivos que no se pueden borrar (en Windows, los que otro
+        proceso tiene mapeados) se dejan para la próxima vez.
+        :return: Cantidad de archivos borrados.
+        """
+        actuales = {f"{columna}-{self.metadatos['generacion']}.bin" for columna in COLUMNAS}
+        borrados = 0
+        for nombre in os.listdir(self.directorio):
+            columna, _, generacion = nombre[:-len(".bin")].rpartition("-")
+            if (not nombre.endswith(".bin") or columna not in COLUMNAS or not generacion.isdigit()
+                    or nombre in actuales):
+                continue
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+                borrados += 1
+            except OSError:
+                pass
+        return borrados
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Almacén binario de pHash compartido entre procesos.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    agregar = subparsers.add_parser("agregar", help="Calcula y agrega los pHash de las imágenes de un directorio.")
+    agregar.add_argument("directorio", help="Directorio con las imágenes (se recorre recursivamente).")
+    agregar.add_argument("--almacen", required=True, help="Directorio del almacén.")
+    agregar.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos para calcular los hashes.")
+    agregar.add_argument("--recalcular", action="store_true", help="Vuelve a hashear las rutas que ya están.")
+
+    compactar = subparsers.add_parser("compactar", help="Quita las entradas reemplazadas y las imágenes borradas.")
+    compactar.add_argument("--almacen", required=True, help="Directorio del almacén.")
+
+    limpiar = subparsers.add_parser("limpiar",
+                                    help="Borra los archivos de generaciones anteriores a la última compactación.")
+    limpiar.add_argument("--almacen", required=True, help="Directorio del almacén.")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenHashes(args.almacen)
+    if args.comando == "agregar":
+        from comparacion import listar_imagenes
+        agregadas = almacen.agregar_imagenes(listar_imagenes(args.directorio), args.workers, not args.recalcular)
+        print(f"{agregadas} imágenes agregadas, {len(almacen)} en el almacén", file=sys.stderr)
+    elif args.comando == "limpiar":
+        print(f"{almacen.limpiar()} archivos borrados", file=sys.stderr)
+    else:
+        anteriores = almacen.metadatos["entradas"]
+        quedaron = almacen.compactar(os.path.exists)
+        print(f"{anteriores} entradas antes, {quedaron} después de compactar", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Control de regresión del tiempo de arranque: mide, en procesos nuevos, cuánto tarda en aparecer la ventana de la
+interfaz, cuánto tarda la línea de comandos (comparar_lote.py) en escribir su primer resultado y cuánto cuesta
+importar los módulos principales. Cada medición tiene un presupuesto en milisegundos; si la mediana de alguna lo
+supera el proceso termina con código 1, para poder correrlo como chequeo antes de integrar cambios.
+
+Las bibliotecas de imágenes (OpenCV, numpy, PIL, imagehash) se importan recién al usarlas (ver
+importacion_perezosa.py); un import de más al cargar un módulo se nota acá como un salto en importar_*.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.arranque [--repeticiones 5] [--escala 1.0] [--salida arranque.json]
+
+--escala multiplica todos los presupuestos, para máquinas más lentas que la de referencia. La medición de la ventana
+se omite si no hay display.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import compileall
+import statistics
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+DIRECTORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(DIRECTORIO_RAIZ, "img", "phash", "foto-og.jpg")
+COMPARADAS = os.path.join(DIRECTORIO_RAIZ, "img", "phash")
+
+# Presupuestos en milisegundos (mediana), con margen de alrededor del doble sobre lo medido en una máquina de un núcleo
+# con los .pyc ya compilados. Los importar_* miden solo el import; la ventana y el primer resultado se miden desde que
+# se lanza el proceso, así que incluyen el arranque de Python
+PRESUPUESTOS_MS = {
+    "importar_comparacion": 60,
+    "importar_interfaz": 120,
+    "importar_comparacion_pdc": 80,
+    "primera_ventana": 400,
+    "primer_resultado_pHash": 500,
+    "primer_resultado_histograma": 500,
+    "primer_resultado_ORB": 650,
+}
+
+# Código de salida con el que el proceso de la ventana indica que no hay display
+SIN_DISPLAY = 3
+
+_SCRIPT_IMPORTAR = "import time; inicio = time.perf_counter(); import {modulo}; print((time.perf_counter() - inicio) * 1000)"
+
+_SCRIPT_VENTANA = f"""
+import sys
+import tkinter as tk
+try:
+    from interfaz import ImageHashComparator
+    app = ImageHashComparator()
+    app.root.update()
+except tk.TclError:
+    sys.exit({SIN_DISPLAY})
+print("lista", flush=True)
+app.root.destroy()
+"""
+
+
+def _medir_importacion(modulo: str) -> float:
+    """
+    Milisegundos que tarda `import modulo` en un intérprete nuevo (sin contar el arranque de Python).
+    """
+    salida = subprocess.run([sys.executable, "-c", _SCRIPT_IMPORTAR.format(modulo=modulo)], cwd=DIRECTORIO_RAIZ,
+                            capture_output=True, text=True, check=True)
+    return float(salida.stdout)
+
+
+def _medir_primera_linea(comando: List[str]) -> Optional[float]:
+    """
+    Milisegundos desde que se lanza el proceso hasta que escribe su primera línea en stdout. None si terminó sin
+    escribir nada porque no hay display.
+    """
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(comando, cwd=DIRECTORIO_RAIZ, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True)
+    try:
+        linea = proceso.stdout.readline()
+        transcurrido = (time.perf_counter() - inicio) * 1000
+    finally:
+        proceso.kill()
+        proceso.wait()
+    if not linea:
+        if proceso.returncode == SIN_DISPLAY:
+            return None
+        raise RuntimeError(f"El proceso terminó sin escribir resultados: {' '.join(comando)}")
+    return transcurrido
+
+
+def mediciones(workers: int) -> Dict[str, Callable[[], Optional[float]]]:
+    funciones = {f"importar_{modulo}": (lambda modulo=modulo: _medir_importacion(modulo))
+                  for modulo in ("comparacion", "interfaz", "comparacion_pdc")}
+    funciones["primera_ventana"] = lambda: _medir_primera_linea([sys.executable, "-c", _SCRIPT_VENTANA])
+    for algoritmo in ("pHash", "histograma", "ORB"):
+        comando = [sys.executable, "comparar_lote.py", ORIGINAL, COMPARADAS, "--algoritmo", algoritmo,
+                   "--workers", str(workers)]
+        funciones[f"primer_resultado_{algoritmo}"] = lambda comando=comando: _medir_primera_linea(comando)
+    return funciones
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos por medición (se usa la mediana).")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de comparar_lote.py.")
+    parser.add_argument("--escala", type=float, default=1.0, help="Factor por el que se multiplican los presupuestos.")
+    parser.add_argument("--salida", default="-", help="Archivo JSON de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    informe = {
+        "parametros": {"repeticiones": args.repeticiones, "workers": args.workers, "escala": args.escala},
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "mediciones": {},
+    }
+    # Se compilan los .pyc antes de medir para no contar la compilación (que no pasa en un uso normal)
+    compileall.compile_dir(DIRECTORIO_RAIZ, quiet=1)
+    excedidas = []
+    for nombre, medir in mediciones(args.workers).items():
+        presupuesto = PRESUPUESTOS_MS[nombre] * args.escala
+        tiempos = [medir() for _ in range(args.repeticiones)]
+        if any(tiempo is None for tiempo in tiempos):
+            informe["mediciones"][nombre] = {"omitida": "sin display"}
+            continue
+        mediana = statistics.median(tiempos)
+        informe["mediciones"][nombre] = {
+            "mediana_ms": round(mediana, 1),
+            "min_ms": round(min(tiempos), 1),
+            "max_ms": round(max(tiempos), 1),
+            "presupuesto_ms": presupuesto,
+            "dentro_del_presupuesto": mediana <= presupuesto,
+        }
+        if mediana > presupuesto:
+            excedidas.append(f"{nombre}: {mediana:.0f} ms > {presupuesto:.0f} ms")
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida == "-":
+        print(texto)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    if excedidas:
+        print("Fuera del presupuesto de arranque:\n  " + "\n  ".join(excedidas), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
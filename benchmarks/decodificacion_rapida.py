@@ -0,0 +1,102 @@
+"""
+Mide cuánto se ahorra y cuánto cambian los resultados con la decodificación rápida (ComparadorImagenes con
+decodificacionRapida=True) respecto de la decodificación completa.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.decodificacion_rapida ORIGINAL CARPETA_O_IMAGENES... [--ampliar 4] [--salida informe.json]
+
+Con --ampliar N las imágenes se amplían N veces y se guardan como JPEG en una carpeta temporal antes de medir, para
+simular fotos de cámara grandes a partir de las imágenes de ejemplo de img/.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import cv2
+import numpy as np
+from typing import Dict, List
+from comparacion import ComparadorImagenes, listar_imagenes
+
+
+def ampliar_corpus(paths: List[str], factor: int, directorio: str) -> List[str]:
+    ampliadas = []
+    for path in paths:
+        img = cv2.imread(path)
+        img = cv2.resize(img, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        destino = os.path.join(directorio, os.path.splitext(os.path.basename(path))[0] + ".jpg")
+        cv2.imwrite(destino, img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        ampliadas.append(destino)
+    return ampliadas
+
+
+def medir(original: str, paths: List[str]) -> Dict[str, object]:
+    completo = ComparadorImagenes(original)
+    rapido = ComparadorImagenes(original, decodificacionRapida=True)
+    informe = {"imagenes": len(paths), "algoritmos": {}}
+
+    metodos = {
+        "pHash": ("compare_pHash", "diferencia"),
+        "histograma": ("compare_histogramas", "similitud"),
+        "ORB": ("compare_ORB", "coincidencias_buenas"),
+    }
+    for nombre, (metodo, campo) in metodos.items():
+        tiempos = {}
+        resultados = {}
+        for etiqueta, comparador in (("completo", completo), ("rapido", rapido)):
+            inicio = time.perf_counter()
+            resultados[etiqueta] = getattr(comparador, metodo)(paths)
+            tiempos[etiqueta] = time.perf_counter() - inicio
+
+        deriva = np.array([abs(float(r[campo]) - float(c[campo]))
+                           for c, r in zip(resultados["completo"], resultados["rapido"])])
+        cambiosVeredicto = sum(1 for c, r in zip(resultados["completo"], resultados["rapido"])
+                               if "son_similares" in c and bool(c["son_similares"]) != bool(r["son_similares"]))
+        informe["algoritmos"][nombre] = {
+            "campo": campo,
+            "segundos_completo": round(tiempos["completo"], 4),
+            "segundos_rapido": round(tiempos["rapido"], 4),
+            "aceleracion": round(tiempos["completo"] / tiempos["rapido"], 2) if tiempos["rapido"] else None,
+            "deriva_media": round(float(deriva.mean()), 4) if len(deriva) else 0,
+            "deriva_maxima": round(float(deriva.max()), 4) if len(deriva) else 0,
+            "cambios_de_veredicto": cambiosVeredicto,
+        }
+
+    # Deriva del propio pHash: bits distintos entre el hash completo y el rápido de la misma imagen
+    bits = [completo._pHash(path) - rapido._pHash(path) for path in paths]
+    informe["algoritmos"]["pHash"]["bits_distintos_mismo_archivo_max"] = int(max(bits)) if bits else 0
+    return informe
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("original")
+    parser.add_argument("imagenes", nargs="+", help="Imágenes o carpetas a comparar.")
+    parser.add_argument("--ampliar", type=int, default=1, help="Factor de ampliación del corpus.")
+    parser.add_argument("--salida", default="-", help="Archivo JSON de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for entrada in args.imagenes:
+        paths.extend(listar_imagenes(entrada) if os.path.isdir(entrada) else [entrada])
+
+    with tempfile.TemporaryDirectory() as temporal:
+        original = args.original
+        if args.ampliar > 1:
+            original = ampliar_corpus([original], args.ampliar, os.path.join(temporal))[0]
+            directorio = os.path.join(temporal, "corpus")
+            os.makedirs(directorio)
+            paths = ampliar_corpus(paths, args.ampliar, directorio)
+        informe = medir(original, paths)
+        informe["ampliacion"] = args.ampliar
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida == "-":
+        print(texto)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
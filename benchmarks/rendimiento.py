@@ -0,0 +1,197 @@
+"""
+Benchmark de rendimiento de comparacion.py y comparacion_pdc.py sobre un corpus sintético.
+
+El corpus se genera a partir de las imágenes de img/ORB e img/phash aplicando transformaciones al azar
+(redimensión, recompresión JPEG, rotación, recorte y cambio de color). Para cada algoritmo se mide imágenes por
+segundo, latencia por imagen (p50/p99) y pico de memoria residente (RSS). Cada algoritmo corre en un proceso nuevo
+para que el pico de memoria de uno no contamine al siguiente. El resultado se escribe como JSON para poder comparar
+corridas entre sí.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.rendimiento [--cantidad 50] [--lado 1024] [--semilla 0] [--salida rendimiento.json]
+                                     [--algoritmos compare_pHash compare_ORB ...]
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import multiprocessing
+import numpy as np
+from PIL import Image, ImageEnhance
+from typing import Callable, Dict, List, Optional, Tuple
+
+DIRECTORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIOS_FUENTE = [os.path.join(DIRECTORIO_RAIZ, "img", "ORB"), os.path.join(DIRECTORIO_RAIZ, "img", "phash")]
+
+ALGORITMOS = ("compare_pHash", "compare_ORB", "compare_histogramas", "calcular_hash_imagen", "comparar_similitud_visual")
+
+
+def _redimensionar(img: Image.Image, rng: random.Random) -> Image.Image:
+    factor = rng.uniform(0.5, 1.5)
+    return img.resize((max(1, int(img.width * factor)), max(1, int(img.height * factor))), Image.LANCZOS)
+
+
+def _rotar(img: Image.Image, rng: random.Random) -> Image.Image:
+    return img.rotate(rng.uniform(-20, 20), resample=Image.BICUBIC, expand=True)
+
+
+def _recortar(img: Image.Image, rng: random.Random) -> Image.Image:
+    proporcion = rng.uniform(0.7, 0.95)
+    ancho, alto = int(img.width * proporcion), int(img.height * proporcion)
+    x, y = rng.randint(0, img.width - ancho), rng.randint(0, img.height - alto)
+    return img.crop((x, y, x + ancho, y + alto))
+
+
+def _cambiar_color(img: Image.Image, rng: random.Random) -> Image.Image:
+    img = ImageEnhance.Color(img).enhance(rng.uniform(0.6, 1.4))
+    return ImageEnhance.Brightness(img).enhance(rng.uniform(0.8, 1.2))
+
+
+def _recomprimir(img: Image.Image, rng: random.Random) -> Image.Image:
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=rng.randint(30, 85))
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+TRANSFORMACIONES: Dict[str, Callable[[Image.Image, random.Random], Image.Image]] = {
+    "redimension": _redimensionar,
+    "recompresion": _recomprimir,
+    "rotacion": _rotar,
+    "recorte": _recortar,
+    "color": _cambiar_color,
+}
+
+
+def generar_corpus(directorio: str, cantidad: int, ladoMayor: int, semilla: int = 0) -> Tuple[str, List[str]]:
+    """
+    Genera el corpus sintético en directorio.
+    :param cantidad: Cantidad de imágenes transformadas.
+    :param ladoMayor: Las imágenes fuente se escalan para que su lado mayor tenga este tamaño antes de transformarlas.
+    :return: Tupla (imagen original, imágenes transformadas). La original es la primera imagen fuente escalada.
+    """
+    rng = random.Random(semilla)
+    fuentes = sorted(
+        os.path.join(carpeta, nombre) for carpeta in DIRECTORIOS_FUENTE for nombre in os.listdir(carpeta)
+    )
+    escaladas = []
+    for path in fuentes:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            factor = ladoMayor / max(img.size)
+            escaladas.append(img.resize((max(1, int(img.width * factor)), max(1, int(img.height * factor))), Image.LANCZOS))
+
+    original = os.path.join(directorio, "original.png")
+    escaladas[0].save(original)
+
+    paths = []
+    for indice in range(cantidad):
+        img = escaladas[indice % len(escaladas)]
+        nombres = rng.sample(sorted(TRANSFORMACIONES), rng.randint(1, 3))
+        for nombre in nombres:
+            img = TRANSFORMACIONES[nombre](img, rng)
+        path = os.path.join(directorio, f"{indice:05d}_{'-'.join(nombres)}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+    return original, paths
+
+
+def _funcion_algoritmo(algoritmo: str, original: str) -> Callable[[str], object]:
+    """
+    Devuelve una función que procesa una imagen con el algoritmo indicado. La imagen original se procesa antes de
+    medir para que la latencia de la primera imagen no incluya calcular la referencia.
+    """
+    if algoritmo in ("calcular_hash_imagen", "comparar_similitud_visual"):
+        import integridad
+        if algoritmo == "calcular_hash_imagen":
+            return integridad.calcular_hash_imagen
+        return lambda path: integridad.comparar_similitud_visual(original, path)
+
+    from comparacion import ComparadorImagenes
+    comparador = ComparadorImagenes(original)
+    metodo = getattr(comparador, algoritmo)
+    metodo([original])
+    return lambda path: metodo([path])
+
+
+def _pico_rss_mb() -> Optional[float]:
+    # Sin el módulo resource (Windows) no hay pico de memoria: el informe lo deja en null
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En Linux ru_maxrss está en KB y en macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _medir_en_proceso(algoritmo: str, original: str, paths: List[str], cola) -> None:
+    try:
+        procesar = _funcion_algoritmo(algoritmo, original)
+        latencias = []
+        inicio = time.perf_counter()
+        for path in paths:
+            t0 = time.perf_counter()
+            procesar(path)
+            latencias.append(time.perf_counter() - t0)
+        total = time.perf_counter() - inicio
+        latencias = np.array(latencias) * 1000
+        cola.put({
+            "imagenes": len(paths),
+            "segundos": round(total, 4),
+            "imagenes_por_segundo": round(len(paths) / total, 2) if total else None,
+            "latencia_ms_p50": round(float(np.percentile(latencias, 50)), 3),
+            "latencia_ms_p99": round(float(np.percentile(latencias, 99)), 3),
+            "pico_rss_mb": _pico_rss_mb(),
+        })
+    except Exception as e:
+        cola.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def medir(algoritmo: str, original: str, paths: List[str]) -> Dict[str, object]:
+    """
+    Mide un algoritmo en un proceso nuevo (spawn) para aislar su pico de memoria.
+    """
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_en_proceso, args=(algoritmo, original, paths, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cantidad", type=int, default=50, help="Cantidad de imágenes del corpus sintético.")
+    parser.add_argument("--lado", type=int, default=1024, help="Lado mayor de las imágenes fuente, en píxeles.")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de las transformaciones.")
+    parser.add_argument("--algoritmos", nargs="+", choices=ALGORITMOS, default=list(ALGORITMOS))
+    parser.add_argument("--salida", default="-", help="Archivo JSON de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    informe = {
+        "parametros": {"cantidad": args.cantidad, "lado": args.lado, "semilla": args.semilla},
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "algoritmos": {},
+    }
+    with tempfile.TemporaryDirectory() as directorio:
+        original, paths = generar_corpus(directorio, args.cantidad, args.lado, args.semilla)
+        for algoritmo in args.algoritmos:
+            informe["algoritmos"][algoritmo] = medir(algoritmo, original, paths)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida == "-":
+        print(texto)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
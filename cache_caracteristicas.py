@@ -0,0 +1,249 @@
+from __future__ import annotations
+import os
+import io
+import time
+import sqlite3
+from typing import Any, Callable, Dict, Optional
+from importacion_perezosa import ModuloPerezoso
+
+cv2 = ModuloPerezoso("cv2")
+imagehash = ModuloPerezoso("imagehash")
+np = ModuloPerezoso("numpy")
+
+# Los aciertos no actualizan ultimo_acceso en el momento: se acumulan y se escriben juntos cuando se juntan estos
+# accesos o pasan estos segundos desde la última escritura (o al desalojar y al cerrar)
+ACCESOS_POR_ESCRITURA = 256
+SEGUNDOS_POR_ESCRITURA = 10.0
+
+# Tabla de una fila con el total de bytes de las entradas, mantenida por triggers en la misma transacción que cada
+# cambio, para no tener que sumar toda la tabla en cada fallo de la cache
+_ESQUEMA_TOTAL = (
+    "CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO meta (id, total) SELECT 0, COALESCE(SUM(tamano), 0) FROM entradas",
+    "CREATE TRIGGER IF NOT EXISTS total_insertar AFTER INSERT ON entradas "
+    "BEGIN UPDATE meta SET total = total + NEW.tamano WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS total_borrar AFTER DELETE ON entradas "
+    "BEGIN UPDATE meta SET total = total - OLD.tamano WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS total_actualizar AFTER UPDATE OF tamano ON entradas "
+    "BEGIN UPDATE meta SET total = total - OLD.tamano + NEW.tamano WHERE id = 0; END",
+)
+
+
+def keypoints_a_array(kp) -> np.ndarray:
+    """
+    Convierte una secuencia de cv2.KeyPoint en un array (N, 7) float32, que a diferencia de los KeyPoint se puede
+    guardar en disco o enviar a otro proceso.
+    """
+    return np.array(
+        [(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in kp],
+        dtype=np.float32
+    ).reshape(-1, 7)
+
+
+def array_a_keypoints(keypoints: np.ndarray) -> tuple:
+    """
+    Operación inversa de keypoints_a_array.
+    """
+    return tuple(
+        cv2.KeyPoint(float(x), float(y), float(s), float(a), float(r), int(o), int(c))
+        for x, y, s, a, r, o, c in keypoints
+    )
+
+
+def _serializar(valor: Any) -> bytes:
+    """
+    Convierte una característica (pHash, tupla ORB (kp, des) o histograma) a bytes en formato npz.
+    No se usa pickle para que un archivo de cache corrupto o ajeno no pueda ejecutar código al cargarse.
+    """
+    buffer = io.BytesIO()
+    if isinstance(valor, imagehash.ImageHash):
+        np.savez(buffer, pHash=valor.hash)
+    elif isinstance(valor, tuple):
+        kp, des = valor
+        keypoints = keypoints_a_array(kp)
+        descriptores = des if des is not None else np.empty((0, 32), dtype=np.uint8)
+        np.savez(buffer, keypoints=keypoints, descriptores=descriptores)
+    else:
+        np.savez(buffer, histograma=np.asarray(valor, dtype=np.float32))
+    return buffer.getvalue()
+
+
+def _deserializar(datos: bytes) -> Any:
+    with np.load(io.BytesIO(datos), allow_pickle=False) as archivo:
+        if "pHash" in archivo:
+            return imagehash.ImageHash(archivo["pHash"])
+        if "keypoints" in archivo:
+            kp = array_a_keypoints(archivo["keypoints"])
+            des = archivo["descriptores"]
+            return kp, (des if len(des) else None)
+        return archivo["histograma"]
+
+
+class CacheCaracteristicas:
+    """
+    Cache en disco de características de imágenes (pHash, keypoints/descriptores ORB e histogramas HSV 50x60).
+
+    Cada entrada se identifica por el tipo de característica y por la identidad del archivo (ruta absoluta, tamaño y
+    fecha de modificación), así que si un archivo cambia su entrada anterior deja de usarse y termina desalojada.
+    Se guarda en SQLite en modo WAL, lo que permite que varios procesos lean y escriban el mismo archivo de cache a la
+    vez. Cuando el tamaño total supera limiteBytes se eliminan las entradas usadas hace más tiempo (LRU).
+    Los aciertos solo leen: la fecha de último acceso se actualiza de a lotes (ver ACCESOS_POR_ESCRITURA), así los
+    procesos que leen la misma cache no se esperan entre sí para escribir. Los accesos que todavía no se escribieron
+    cuando termina un proceso sin llamar a cerrar() se pierden, lo que solo afecta el orden del desalojo.
+    """
+
+    def __init__(self, pathCache: str = "cache_caracteristicas.sqlite", limiteBytes: int = 512 * 1024 * 1024):
+        """
+        :param pathCache: Ruta del archivo de cache.
+        :param limiteBytes: Tamaño máximo que pueden ocupar las entradas antes de desalojar las menos usadas.
+        """
+        self.pathCache = pathCache
+        self.limiteBytes = limiteBytes
+        self.aciertos = 0
+        self.fallos = 0
+        self._conexionActual: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._accesosPendientes: Dict[str, float] = {}
+        self._ultimaEscritura = time.monotonic()
+
+    def __getstate__(self):
+        # Las conexiones SQLite no se pueden compartir entre procesos: cada proceso abre la suya
+        estado = self.__dict__.copy()
+        estado["_conexionActual"] = None
+        estado["_pid"] = None
+        estado["_accesosPendientes"] = {}
+        return estado
+
+    def _conexion(self) -> sqlite3.Connection:
+        if self._conexionActual is None or self._pid != os.getpid():
+            directorio = os.path.dirname(os.path.abspath(self.pathCache))
+            os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.pathCache, timeout=30, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS entradas ("
+                "clave TEXT PRIMARY KEY, datos BLOB NOT NULL, tamano INTEGER NOT NULL, ultimo_acceso REAL NOT NULL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acceso ON entradas (ultimo_acceso)")
+            # En una transacción para que ningún proceso agregue entradas entre que se calcula el total inicial (solo
+            # la primera vez, en caches creadas antes de la tabla meta) y que existen los triggers
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                for sentencia in _ESQUEMA_TOTAL:
+                    conexion.execute(sentencia)
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+            self._conexionActual = conexion
+            self._pid = os.getpid()
+        return self._conexionActual
+
+    @staticmethod
+    def clave(tipo: str, path: str) -> str:
+        """
+        Clave de una característica: tipo, ruta absoluta, tamaño y fecha de modificación (en nanosegundos).
+        """
+        estado = os.stat(path)
+        return f"{tipo}|{os.path.abspath(path)}|{estado.st_size}|{estado.st_mtime_ns}"
+
+    def obtener(self, tipo: str, path: str, calcular: Callable[[], Any]) -> Any:
+        """
+        Devuelve la característica guardada para el archivo o la calcula con calcular() y la guarda.
+        :param tipo: Tipo de característica (ej: "pHash", "ORB-1000", "histograma").
+        :param path: Ruta de la imagen.
+        :param calcular: Función sin argumentos que calcula la característica si no está en la cache.
+        """
+        clave = self.clave(tipo, path)
+        conexion = self._conexion()
+        fila = conexion.execute("SELECT datos FROM entradas WHERE clave = ?", (clave,)).fetchone()
+        if fila is not None:
+            self.aciertos += 1
+            self._accesosPendientes[clave] = time.time()
+            if (len(self._accesosPendientes) >= ACCESOS_POR_ESCRITURA
+                    or time.monotonic() - self._ultimaEscritura >= SEGUNDOS_POR_ESCRITURA):
+                self._escribir_accesos(conexion)
+            return _deserializar(fila[0])
+
+        self.fallos += 1
+        valor = calcular()
+        datos = _serializar(valor)
+        # Con ON CONFLICT (y no INSERT OR REPLACE) el reemplazo es un UPDATE y el trigger ajusta el total
+        conexion.execute(
+            "INSERT INTO entradas (clave, datos, tamano, ultimo_acceso) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (clave) DO UPDATE SET datos = excluded.datos, tamano = excluded.tamano, "
+            "ultimo_acceso = excluded.ultimo_acceso",
+            (clave, datos, len(datos), time.time())
+        )
+        self._desalojar(conexion)
+        return valor
+
+    def _escribir_accesos(self, conexion: sqlite3.Connection) -> None:
+        """
+        Escribe en una sola transacción las fechas de último acceso acumuladas por los aciertos.
+        """
+        self._ultimaEscritura = time.monotonic()
+        if not self._accesosPendientes:
+            return
+        accesos = [(momento, clave) for clave, momento in self._accesosPendientes.items()]
+        self._accesosPendientes = {}
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            conexion.executemany("UPDATE entradas SET ultimo_acceso = ? WHERE clave = ?", accesos)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _total(conexion: sqlite3.Connection) -> int:
+        return conexion.execute("SELECT total FROM meta WHERE id = 0").fetchone()[0]
+
+    def _desalojar(self, conexion: sqlite3.Connection) -> None:
+        """
+        Elimina las entradas usadas hace más tiempo hasta que el total entra en limiteBytes.
+        Se hace dentro de una transacción exclusiva para que dos procesos no desalojen a la vez.
+        """
+        if self._total(conexion) <= self.limiteBytes:
+            return
+        # Los accesos pendientes de este proceso se escriben antes para no desalojar entradas que se acaban de usar
+        self._escribir_accesos(conexion)
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            total = self._total(conexion)
+            eliminar = []
+            for clave, tamano in conexion.execute("SELECT clave, tamano FROM entradas ORDER BY ultimo_acceso"):
+                if total <= self.limiteBytes:
+                    break
+                eliminar.append((clave,))
+                total -= tamano
+            conexion.executemany("DELETE FROM entradas WHERE clave = ?", eliminar)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def estadisticas(self) -> Dict[str, int]:
+        """
+        Contadores de aciertos y fallos de esta instancia (incluidos los de los procesos de un ComparadorImagenes con
+        workers > 1, que se suman al recibir cada resultado), y número de entradas y bytes ocupados en disco.
+        """
+        conexion = self._conexion()
+        entradas = conexion.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        total = self._total(conexion)
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": entradas, "bytes": total}
+
+    def limpiar(self) -> None:
+        """
+        Elimina todas las entradas de la cache.
+        """
+        self._accesosPendientes = {}
+        self._conexion().execute("DELETE FROM entradas")
+
+    def cerrar(self) -> None:
+        if self._conexionActual is not None:
+            if self._pid == os.getpid():
+                self._escribir_accesos(self._conexionActual)
+            self._conexionActual.close()
+            self._conexionActual = None
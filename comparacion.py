@@ -1,21 +1,467 @@
+from __future__ import annotations
 import os
+import io
 from datetime import datetime 
-import cv2
-import imagehash
-from PIL import Image
-import numpy as np
-from typing import List, Dict, Union
+from collections import deque
+from typing import List, Dict, Union, Tuple, Callable, Any, Optional, Iterable, Iterator
+from cache_caracteristicas import CacheCaracteristicas, keypoints_a_array, array_a_keypoints
+from instrumentacion import Instrumentacion, sin_medir
+from escritor_coincidencias import EscritorCoincidencias
+from almacen_hashes import AlmacenHashes
+from phash_lote import phash
+from orb_mosaicos import detectar_ORB_mosaicos
+from importacion_perezosa import ModuloPerezoso
+
+# Las bibliotecas de imágenes se importan recién al usarlas (ver importacion_perezosa.py)
+cv2 = ModuloPerezoso("cv2")
+imagehash = ModuloPerezoso("imagehash")
+Image = ModuloPerezoso("PIL.Image")
+np = ModuloPerezoso("numpy")
+
+
+# Métodos de cv2.compareHist, con los mismos valores que cv2.HISTCMP_*. Se definen acá porque se usan como valores
+# por defecto y con cv2 perezoso eso obligaría a importar OpenCV al cargar el módulo
+HISTCMP_CORREL = 0
+HISTCMP_CHISQR = 1
+HISTCMP_INTERSECT = 2
+HISTCMP_BHATTACHARYYA = 3
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp")
+
+
+def listar_imagenes(directorio: str) -> Iterator[str]:
+    """
+    Recorre el directorio (recursivamente) y devuelve de a una las rutas de los archivos de imagen, en orden estable.
+    Al ser un generador se puede pasar directamente a los métodos iter_compare_* sin cargar toda la lista.
+    """
+    for raiz, carpetas, archivos in os.walk(directorio):
+        carpetas.sort()
+        for nombre in sorted(archivos):
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN):
+                yield os.path.join(raiz, nombre)
+
+
+# Lado mínimo (en píxeles) que debe conservar la imagen al decodificarla reducida en el modo rápido.
+# pHash trabaja sobre 32x32, el histograma H-S tolera bastante reducción y ORB necesita más detalle para sus keypoints.
+LADO_MINIMO_RAPIDO = {"pHash": 64, "histograma": 256, "ORB": 1000}
+
+# Nombres de los modos de cv2.imread por factor de reducción (se buscan en cv2 al leer, ver ModuloPerezoso)
+_LECTURA_COLOR = {1: "IMREAD_COLOR", 2: "IMREAD_REDUCED_COLOR_2", 4: "IMREAD_REDUCED_COLOR_4", 8: "IMREAD_REDUCED_COLOR_8"}
+_LECTURA_GRIS = {1: "IMREAD_GRAYSCALE", 2: "IMREAD_REDUCED_GRAYSCALE_2", 4: "IMREAD_REDUCED_GRAYSCALE_4", 8: "IMREAD_REDUCED_GRAYSCALE_8"}
+
+
+def factor_reduccion(path: str, ladoMinimo: int) -> int:
+    """
+    Mayor factor de reducción de OpenCV (1, 2, 4 u 8) con el que el lado menor de la imagen sigue siendo >= ladoMinimo.
+    El tamaño se lee de la cabecera del archivo sin decodificar la imagen.
+    """
+    with Image.open(path) as imagen:
+        ladoMenor = min(imagen.size)
+    factor = 1
+    while factor < 8 and ladoMenor // (factor * 2) >= ladoMinimo:
+        factor *= 2
+    return factor
+
+
+def leer_imagen(path: str, algoritmo: str, gris: bool = False, rapida: bool = False) -> np.ndarray:
+    """
+    Lee la imagen con OpenCV. En el modo rápido usa IMREAD_REDUCED_*, que en JPEG decodifica directamente a 1/2, 1/4
+    u 1/8 del tamaño (escalando la DCT) en lugar de decodificar todo y achicar después.
+    :param algoritmo: "ORB" o "histograma", para elegir el lado mínimo de LADO_MINIMO_RAPIDO.
+    """
+    factor = factor_reduccion(path, LADO_MINIMO_RAPIDO[algoritmo]) if rapida else 1
+    imagen = cv2.imread(path, getattr(cv2, (_LECTURA_GRIS if gris else _LECTURA_COLOR)[factor]))
+    if imagen is None:
+        raise ValueError(f"No se pudo leer la imagen: {path}")
+    return imagen
+
+
+def calcular_pHash(path: str, rapida: bool = False, medir: Callable[[str], Any] = sin_medir) -> imagehash.ImageHash:
+    """
+    Calcula el pHash de la imagen en path.
+    En el modo rápido se usa draft() de PIL, que en JPEG decodifica solo la luminancia y a escala reducida
+    (manteniendo al menos LADO_MINIMO_RAPIDO["pHash"] píxeles por lado); en otros formatos no tiene efecto.
+    :param medir: Instrumentacion.etapa para medir la decodificación y la extracción por separado.
+    """
+    with Image.open(path) as imagen:
+        with medir("decodificacion"):
+            if rapida:
+                lado = LADO_MINIMO_RAPIDO["pHash"]
+                imagen.draft("L", (lado, lado))
+            imagen.load()
+        with medir("extraccion"):
+            return phash(imagen)
+
+
+def calcular_ORB(path: str, limiteCaracteristicas: int = 1000, rapida: bool = False,
+                 medir: Callable[[str], Any] = sin_medir,
+                 ladoMosaico: Optional[int] = None) -> Tuple[np.ndarray, tuple, np.ndarray]:
+    """
+    Lee la imagen en escala de grises y detecta sus puntos clave ORB.
+    :param ladoMosaico: Ver detectar_ORB.
+    :return: Tupla (imagen, keypoints, descriptores). La imagen se devuelve para poder dibujar las coincidencias.
+    """
+    with medir("decodificacion"):
+        imagen = leer_imagen(path, "ORB", gris=True, rapida=rapida)
+    with medir("extraccion"):
+        kp, des = detectar_ORB(imagen, limiteCaracteristicas, ladoMosaico)
+    return imagen, kp, des
+
+
+def detectar_ORB(imagen: np.ndarray, limiteCaracteristicas: int = 1000,
+                 ladoMosaico: Optional[int] = None) -> Tuple[tuple, np.ndarray]:
+    """
+    Detecta los puntos clave ORB de una imagen en escala de grises ya decodificada.
+    :param ladoMosaico: Si se indica y la imagen tiene algún lado mayor, se detecta por mosaicos de ese lado, con
+    memoria acotada y los keypoints repartidos por toda la imagen (ver orb_mosaicos.detectar_ORB_mosaicos).
+    """
+    if ladoMosaico and max(imagen.shape[:2]) > ladoMosaico:
+        return detectar_ORB_mosaicos(imagen, limiteCaracteristicas, ladoMosaico)
+    orb = cv2.ORB_create(limiteCaracteristicas)
+    return orb.detectAndCompute(imagen, None)
+
+
+def filtrar_coincidencias(coincidencias) -> Tuple[list, list]:
+    """
+    Ordena las coincidencias ORB por distancia y separa las buenas.
+    :return: Tupla (coincidencias ordenadas, coincidencias buenas).
+    """
+    coincidencias = sorted(coincidencias, key=lambda x: x.distance)
+
+    # Filtrado de coincidencias buenas (distancia menor a 1.5 * mediana)
+    distancias = [m.distance for m in coincidencias]
+    if distancias:
+        umbral = np.median(distancias) * 1.5
+        buenas_coincidencias = [m for m in coincidencias if m.distance < umbral]
+    else:
+        buenas_coincidencias = []
+    return coincidencias, buenas_coincidencias
+
+
+def calcular_histograma(path: str, rapida: bool = False, medir: Callable[[str], Any] = sin_medir) -> np.ndarray:
+    """
+    Calcula el histograma H-S (50x60) normalizado de la imagen en espacio HSV.
+    """
+    with medir("decodificacion"):
+        img = leer_imagen(path, "histograma", rapida=rapida)
+    with medir("extraccion"):
+        return histograma_hsv(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+
+
+def histograma_hsv(hsv: np.ndarray) -> np.ndarray:
+    """
+    Histograma H-S (50x60) normalizado de una imagen ya convertida a HSV.
+    """
+    hist = cv2.calcHist([hsv], [0, 1], None, [50, 60], [0, 180, 0, 256])
+    cv2.normalize(hist, hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
+    return hist
+
+
+ALGORITMOS = ("pHash", "histograma", "ORB")
+
+
+class VistasImagen:
+    """
+    Lee los bytes de un archivo una sola vez, los decodifica una sola vez a BGR y deriva de ese buffer las vistas en
+    escala de grises (pHash, ORB) y HSV (histograma) solo cuando se piden por primera vez.
+    """
+
+    def __init__(self, path: str, algoritmos: Iterable[str] = ALGORITMOS, rapida: bool = False,
+                 medir: Callable[[str], Any] = sin_medir):
+        self.path = path
+        self.algoritmos = tuple(algoritmos)
+        self.rapida = rapida
+        self.medir = medir
+        # Se usa la reducción que tolera el algoritmo más exigente de los pedidos
+        self.ladoMinimo = max(LADO_MINIMO_RAPIDO[a] for a in self.algoritmos)
+        self._bgr = None
+        self._gris = None
+        self._hsv = None
+
+    @property
+    def bgr(self) -> np.ndarray:
+        if self._bgr is None:
+            with self.medir("decodificacion"):
+                datos = np.fromfile(self.path, dtype=np.uint8)
+                factor = 1
+                if self.rapida:
+                    with Image.open(io.BytesIO(datos)) as imagen:
+                        ladoMenor = min(imagen.size)
+                    while factor < 8 and ladoMenor // (factor * 2) >= self.ladoMinimo:
+                        factor *= 2
+                self._bgr = cv2.imdecode(datos, getattr(cv2, _LECTURA_COLOR[factor]))
+            if self._bgr is None:
+                raise ValueError(f"No se pudo decodificar la imagen: {self.path}")
+        return self._bgr
+
+    @property
+    def gris(self) -> np.ndarray:
+        if self._gris is None:
+            self._gris = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gris
+
+    @property
+    def hsv(self) -> np.ndarray:
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+
+def _empaquetar_ORB(referencia: tuple, incluirImagen: bool) -> tuple:
+    # La imagen original solo se envía si hace falta para dibujar las coincidencias
+    return (referencia[0] if incluirImagen else None, keypoints_a_array(referencia[1]), referencia[2])
+
+
+def _empaquetar_referencia(metodo: str, referencia: Any, parametros: Dict[str, Any]) -> Any:
+    """
+    Prepara la referencia para enviarla a los procesos del pool: los cv2.KeyPoint no se pueden serializar, así que
+    viajan como array y se reconstruyen en _desempaquetar_referencia.
+    """
+    if metodo == "_comparar_ORB_una":
+        return _empaquetar_ORB(referencia, parametros["saveOutput"])
+    if metodo == "_comparar_todo_una" and "ORB" in referencia:
+        referencia = dict(referencia)
+        referencia["ORB"] = _empaquetar_ORB(referencia["ORB"], parametros["saveOutput"])
+    return referencia
+
+
+def _desempaquetar_referencia(metodo: str, referencia: Any) -> Any:
+    if metodo == "_comparar_ORB_una":
+        return (referencia[0], array_a_keypoints(referencia[1]), referencia[2])
+    if metodo == "_comparar_todo_una" and "ORB" in referencia:
+        ORB = referencia["ORB"]
+        referencia = dict(referencia)
+        referencia["ORB"] = (ORB[0], array_a_keypoints(ORB[1]), ORB[2])
+    return referencia
+
+
+# Estado de cada proceso del pool: el comparador y las características de la imagen original se reciben una sola vez
+# en el initializer y se reutilizan para todas las tareas que ejecute ese proceso
+_trabajador: Dict[str, Any] = {}
+
+
+def _inicializar_trabajador(hilosOpenCV: int, comparador: "ComparadorImagenes", metodo: str, referencia: Any) -> None:
+    cv2.setNumThreads(hilosOpenCV)
+    _trabajador["comparar"] = comparador._funcion_comparacion(metodo)
+    _trabajador["referencia"] = _desempaquetar_referencia(metodo, referencia)
+    _trabajador["cache"] = comparador.cache
+
+
+def _tarea_trabajador(path: str, parametros: Dict[str, Any]) -> Tuple[Dict[str, Any], Tuple[int, int]]:
+    # Los contadores de la cache de este proceso no vuelven al principal: cada tarea devuelve sus aciertos y fallos
+    # junto con el resultado para que se sumen allá (ver ComparadorImagenes._siguiente_terminado)
+    cache = _trabajador["cache"]
+    if cache is None:
+        return _trabajador["comparar"](path, _trabajador["referencia"], **parametros), (0, 0)
+    aciertos, fallos = cache.aciertos, cache.fallos
+    resultado = _trabajador["comparar"](path, _trabajador["referencia"], **parametros)
+    return resultado, (cache.aciertos - aciertos, cache.fallos - fallos)
+
+
+def _terminar_pool(pool) -> None:
+    """
+    Descarta las tareas de un ProcessPoolExecutor que no empezaron y termina sus procesos sin esperar a las que están
+    en curso (shutdown solo puede esperarlas). Las tareas interrumpidas terminan con BrokenProcessPool.
+    """
+    # ProcessPoolExecutor no tiene una forma pública de terminar sus procesos; la lista se toma antes de shutdown,
+    # que la descarta
+    procesos = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proceso in procesos:
+        proceso.terminate()
+
 
 class ComparadorImagenes:
     """
     Clase para comparar imágenes usando pHash y ORB.
     Permite comparar una imagen original con múltiples imágenes de prueba.
+    Las características de la imagen original se calculan una sola vez por instancia (al primer uso) y se recalculan
+    solo si cambia la fecha de modificación o el tamaño del archivo.
+    Si se indica una CacheCaracteristicas, las características de todas las imágenes se buscan primero en ella.
+    Con decodificacionRapida=True las imágenes se decodifican a escala reducida (ver LADO_MINIMO_RAPIDO), lo que es
+    mucho más rápido con fotos grandes a cambio de pequeñas diferencias en los resultados.
+    Si se indica una Instrumentacion, cada resultado incluye en "tiempos" lo que tardó cada etapa para esa imagen, y
+    al terminar cada llamada instrumentacion.ultima_llamada tiene el resumen (ver Instrumentacion).
+    Si se indica un EscritorCoincidencias, las imágenes de coincidencias ORB (saveOutput=True) se dibujan y guardan
+    en segundo plano con la escala y codificación del escritor; los métodos esperan a que estén guardadas antes de
+    terminar.
+    Con ladoMosaicoORB, ORB procesa las imágenes más grandes que ese lado por mosaicos (ver orb_mosaicos.py): la
+    memoria de la detección queda acotada y los keypoints se reparten por toda la imagen en lugar de concentrarse en
+    la zona con más textura. Pensado para escaneos y mapas de decenas o cientos de megapíxeles.
     """
     
-    def __init__(self, pathOriginal: str):
+    def __init__(self, pathOriginal: str, cache: Optional[CacheCaracteristicas] = None, decodificacionRapida: bool = False,
+                 instrumentacion: Optional[Instrumentacion] = None, escritor: Optional[EscritorCoincidencias] = None,
+                 ladoMosaicoORB: Optional[int] = None):
         self.pathOriginal = pathOriginal
+        self.cache = cache
+        self.decodificacionRapida = decodificacionRapida
+        self.instrumentacion = instrumentacion
+        self.escritor = escritor
+        self.ladoMosaicoORB = ladoMosaicoORB
+        self._caracteristicasOriginal: Dict[Any, Any] = {}
+        self._firmaOriginal = None
+        self._poolActivo = None
+        self._cancelado = False
 
-    def compare_pHash(self, pathsComparaciones: List[str], limite: int = 10) -> List[Dict[str, Union[str, int, bool]]]:
+    def __getstate__(self):
+        # Al enviar el comparador a otro proceso no se copian las características en memoria (los KeyPoint no se
+        # pueden serializar); la referencia se envía aparte una sola vez por proceso
+        estado = self.__dict__.copy()
+        estado["_caracteristicasOriginal"] = {}
+        estado["_firmaOriginal"] = None
+        estado["_poolActivo"] = None
+        return estado
+
+    def cancelar(self) -> None:
+        """
+        Detiene desde otro hilo la comparación en curso con workers > 1: se descartan las imágenes que no empezaron y
+        se terminan los procesos del pool sin esperar a las que se están comparando. El generador que la ejecutaba
+        termina sin devolver más resultados. Las comparaciones en serie (sin workers) no se pueden interrumpir: el
+        hilo que las ejecuta termina la imagen en curso.
+        """
+        self._cancelado = True
+        pool = self._poolActivo
+        if pool is not None:
+            _terminar_pool(pool)
+
+    def _caracteristica_original(self, clave: Any, calcular: Callable[[], Any]) -> Any:
+        """
+        Devuelve una característica de la imagen original (pHash, ORB, histograma), calculándola solo la primera vez.
+        Si el archivo original cambió desde el último cálculo, se descartan todas las características guardadas.
+        """
+        estado = os.stat(self.pathOriginal)
+        firma = (estado.st_mtime_ns, estado.st_size)
+        if firma != self._firmaOriginal:
+            self._caracteristicasOriginal.clear()
+            self._firmaOriginal = firma
+        if clave not in self._caracteristicasOriginal:
+            self._caracteristicasOriginal[clave] = calcular()
+        return self._caracteristicasOriginal[clave]
+
+    def _tipo_cache(self, tipo: str) -> str:
+        # Las características decodificadas a escala reducida se guardan aparte de las de resolución completa
+        return f"{tipo}-rapido" if self.decodificacionRapida else tipo
+
+    def _tipo_ORB(self, limiteCaracteristicas: int) -> str:
+        # Los keypoints detectados por mosaicos se guardan en la cache aparte de los de la imagen completa
+        tipo = f"ORB-{limiteCaracteristicas}"
+        return f"{tipo}-mosaicos{self.ladoMosaicoORB}" if self.ladoMosaicoORB else tipo
+
+    def _con_cache(self, tipo: str, path: str, calcular: Callable[[], Any]) -> Any:
+        if self.cache is None:
+            return calcular()
+        return self.cache.obtener(self._tipo_cache(tipo), path, calcular)
+
+    @property
+    def _medir(self) -> Callable[[str], Any]:
+        return sin_medir if self.instrumentacion is None else self.instrumentacion.etapa
+
+    def _pHash(self, path: str) -> imagehash.ImageHash:
+        return self._con_cache("pHash", path, lambda: calcular_pHash(path, self.decodificacionRapida, self._medir))
+
+    def _ORB(self, path: str, limiteCaracteristicas: int) -> Tuple[Optional[np.ndarray], tuple, np.ndarray]:
+        """
+        Keypoints y descriptores ORB de la imagen. Con cache la imagen no se guarda, así que se devuelve None en su
+        lugar y solo se lee del disco si hace falta dibujar las coincidencias.
+        """
+        if self.cache is None:
+            return calcular_ORB(path, limiteCaracteristicas, self.decodificacionRapida, self._medir, self.ladoMosaicoORB)
+        kp, des = self._con_cache(
+            self._tipo_ORB(limiteCaracteristicas), path,
+            lambda: calcular_ORB(path, limiteCaracteristicas, self.decodificacionRapida, self._medir,
+                                 self.ladoMosaicoORB)[1:]
+        )
+        return None, kp, des
+
+    def _histograma(self, path: str) -> np.ndarray:
+        return self._con_cache("histograma", path,
+                               lambda: calcular_histograma(path, self.decodificacionRapida, self._medir))
+
+    def _funcion_comparacion(self, metodo: str) -> Callable[..., Dict[str, Any]]:
+        comparar = getattr(self, metodo)
+        if self.instrumentacion is None:
+            return comparar
+        return self.instrumentacion.medir_imagen(comparar)
+
+    def _iterar(self, metodo: str, pathsComparaciones: Iterable[str], referencia: Any, parametros: Dict[str, Any],
+                workers: Optional[int], ventana: Optional[int] = None, ordenado: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Ejecuta metodo(path, referencia, **parametros) para cada imagen, en serie o en un pool de procesos, y devuelve
+        cada resultado apenas está listo.
+
+        Con workers > 1 la referencia se envía a cada proceso una sola vez (en el initializer) y no en cada tarea.
+        Cada proceso limita los hilos de OpenCV a su parte de los núcleos para no saturar la CPU.
+        Las rutas se consumen de a poco: nunca hay más de `ventana` imágenes en proceso a la vez, así que la memoria
+        no crece con la cantidad de imágenes aunque pathsComparaciones sea un generador infinito.
+        Si ordenado es True los resultados salen en el mismo orden que las rutas; si no, en el orden en que terminan.
+        """
+        if self.instrumentacion is None:
+            yield from self._ejecutar(metodo, pathsComparaciones, referencia, parametros, workers, ventana, ordenado)
+            return
+        # El resumen se arma en este proceso con los tiempos que trae cada resultado, aunque venga de otro proceso
+        self.instrumentacion.iniciar_llamada(metodo[len("_comparar_"):-len("_una")])
+        try:
+            for resultado in self._ejecutar(metodo, pathsComparaciones, referencia, parametros, workers, ventana, ordenado):
+                self.instrumentacion.registrar(resultado)
+                yield resultado
+        finally:
+            self.instrumentacion.terminar_llamada()
+
+    def _ejecutar(self, metodo: str, pathsComparaciones: Iterable[str], referencia: Any, parametros: Dict[str, Any],
+                  workers: Optional[int], ventana: Optional[int], ordenado: bool) -> Iterator[Dict[str, Any]]:
+        if not workers or workers <= 1:
+            comparar = self._funcion_comparacion(metodo)
+            for path in pathsComparaciones:
+                yield comparar(path, referencia, **parametros)
+            return
+
+        # concurrent.futures importa multiprocessing, que solo hace falta con workers > 1
+        from concurrent.futures import ProcessPoolExecutor, CancelledError
+        from concurrent.futures.process import BrokenProcessPool
+        referencia = _empaquetar_referencia(metodo, referencia, parametros)
+        hilosOpenCV = max(1, (os.cpu_count() or 1) // workers)
+        ventana = max(1, ventana or workers * 4)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_trabajador,
+                                   initargs=(hilosOpenCV, self, metodo, referencia))
+        self._cancelado = False
+        self._poolActivo = pool
+        pendientes = deque()
+        completo = False
+        try:
+            for path in pathsComparaciones:
+                pendientes.append(pool.submit(_tarea_trabajador, path, parametros))
+                if len(pendientes) >= ventana:
+                    yield self._siguiente_terminado(pendientes, ordenado)
+            while pendientes:
+                yield self._siguiente_terminado(pendientes, ordenado)
+            completo = True
+        except (BrokenProcessPool, CancelledError, RuntimeError):
+            # RuntimeError: submit después de que cancelar() cerró el pool
+            if not self._cancelado:
+                raise
+        finally:
+            self._poolActivo = None
+            if completo:
+                pool.shutdown(wait=True)
+            else:
+                # Se dejó de consumir el generador o se canceló: no se espera a las imágenes en curso
+                _terminar_pool(pool)
+
+    def _siguiente_terminado(self, pendientes: deque, ordenado: bool) -> Dict[str, Any]:
+        if ordenado:
+            terminado = pendientes.popleft()
+        else:
+            from concurrent.futures import wait, FIRST_COMPLETED
+            terminado = next(iter(wait(pendientes, return_when=FIRST_COMPLETED).done))
+            pendientes.remove(terminado)
+        resultado, (aciertos, fallos) = terminado.result()
+        if self.cache is not None:
+            self.cache.aciertos += aciertos
+            self.cache.fallos += fallos
+        return resultado
+
+    def compare_pHash(self, pathsComparaciones: List[str], limite: int = 10, workers: Optional[int] = None) -> List[Dict[str, Union[str, int, bool]]]:
         """
         Compara imágenes usando pHash (Perceptual Hashing).
         
@@ -23,6 +469,7 @@ class ComparadorImagenes:
         
         :param pathsComparaciones: Lista de rutas de imágenes a comparar con la imagen original.
         :param limite: Límite de diferencia para considerar dos imágenes similares.
+        :param workers: Si es mayor a 1, número de procesos en paralelo para comparar las imágenes.
         :return: Lista de diccionarios con resultados de comparación.
         Cada diccionario contiene:
             - "imagen": Ruta de la imagen comparada.
@@ -30,28 +477,75 @@ class ComparadorImagenes:
             - "son_similares": Booleano indicando si la imagen es similar a la original.
             - "fecha_modificacion": Indica la ultima vez que se modifico el archivo
         """
-        original = Image.open(self.pathOriginal)
-        pHashOriginal = imagehash.phash(original)
-        resultados = []
-
-        for path in pathsComparaciones:
-            imagenTest = Image.open(path)
-            diferenciapHash = pHashOriginal - imagehash.phash(imagenTest)
-            print(f"HASH DE LA IMAGEN ORIGINAL: {pHashOriginal}")
-            print(f"HASH DE LA IMAGEN COMPARADA: {imagehash.phash(imagenTest)}")
-            timeStamp = os.path.getmtime(path)
-            fechaMod = datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S")
-            resultados.append({
-                "imagen": path,
-                "diferencia": int(diferenciapHash),
-                "hash_original": str(pHashOriginal),
-                "hash_comparada": str(imagehash.phash(imagenTest)),
-                "fecha_modificacion": fechaMod,
-                "son_similares": diferenciapHash <= limite
-            })
-        return resultados
-
-    def compare_ORB(self, pathsComparaciones: List[str], limiteCaracteristicas: int = 1000, saveOutput: bool = False, dirOutput: str = "resultados_ORB") -> List[Dict[str, Union[int, str]]]:
+        return list(self.iter_compare_pHash(pathsComparaciones, limite, workers))
+
+    def iter_compare_pHash(self, pathsComparaciones: Iterable[str], limite: int = 10, workers: Optional[int] = None,
+                           ventana: Optional[int] = None, ordenado: bool = True) -> Iterator[Dict[str, Union[str, int, bool]]]:
+        """
+        Igual que compare_pHash, pero acepta cualquier iterable de rutas y devuelve cada resultado apenas está listo.
+        :param ventana: Máximo de imágenes en proceso a la vez cuando workers > 1 (por defecto 4 por proceso).
+        :param ordenado: Si es False, con workers > 1 los resultados salen en el orden en que terminan.
+        """
+        pHashOriginal = self._caracteristica_original("pHash", lambda: self._pHash(self.pathOriginal))
+        yield from self._iterar("_comparar_pHash_una", pathsComparaciones, pHashOriginal, {"limite": limite},
+                                workers, ventana, ordenado)
+
+    def _comparar_pHash_una(self, path: str, pHashOriginal: imagehash.ImageHash, limite: int) -> Dict[str, Union[str, int, bool]]:
+        return self._resultado_pHash(path, pHashOriginal, self._pHash(path), limite)
+
+    def _resultado_pHash(self, path: str, pHashOriginal: imagehash.ImageHash, pHashTest: imagehash.ImageHash,
+                         limite: int) -> Dict[str, Union[str, int, bool]]:
+        with self._medir("comparacion"):
+            diferenciapHash = pHashOriginal - pHashTest
+        timeStamp = os.path.getmtime(path)
+        fechaMod = datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            "imagen": path,
+            "diferencia": int(diferenciapHash),
+            "hash_original": str(pHashOriginal),
+            "hash_comparada": str(pHashTest),
+            "fecha_modificacion": fechaMod,
+            "son_similares": diferenciapHash <= limite
+        }
+
+    def compare_pHash_almacen(self, almacen: AlmacenHashes, limite: int = 10) -> List[Dict[str, Union[str, int, bool]]]:
+        """
+        Igual que compare_pHash, pero compara contra los pHash ya calculados de un AlmacenHashes en lugar de leer las
+        imágenes. La búsqueda es vectorizada sobre la columna de hashes mapeada en memoria, así que se puede recorrer
+        un corpus de millones de imágenes sin abrir ningún archivo.
+        :param almacen: Almacén con los pHash de las imágenes candidatas (ver almacen_hashes.py).
+        :param limite: Límite de diferencia para considerar dos imágenes similares.
+        :return: Lista de diccionarios con los mismos campos que compare_pHash, solo de las imágenes similares
+        (diferencia <= limite) y en el orden del almacén. "fecha_modificacion" es None si el archivo ya no existe.
+        """
+        return list(self.iter_compare_pHash_almacen(almacen, limite))
+
+    def iter_compare_pHash_almacen(self, almacen: AlmacenHashes, limite: int = 10,
+                                   tamanoBloque: int = 1 << 20) -> Iterator[Dict[str, Union[str, int, bool]]]:
+        """
+        Igual que compare_pHash_almacen, pero devuelve cada resultado apenas se encuentra.
+        :param tamanoBloque: Hashes que se comparan a la vez.
+        """
+        pHashOriginal = self._caracteristica_original("pHash", lambda: self._pHash(self.pathOriginal))
+        valorOriginal = int(str(pHashOriginal), 16)
+        hashes = almacen.hashes
+        ids = almacen.ids
+        for posiciones, distancias in almacen.buscar(valorOriginal, limite, tamanoBloque):
+            for posicion, diferencia in zip(posiciones.tolist(), distancias.tolist()):
+                path = almacen.ruta(int(ids[posicion]))
+                fechaMod = None
+                if os.path.exists(path):
+                    fechaMod = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+                yield {
+                    "imagen": path,
+                    "diferencia": diferencia,
+                    "hash_original": str(pHashOriginal),
+                    "hash_comparada": f"{int(hashes[posicion]):016x}",
+                    "fecha_modificacion": fechaMod,
+                    "son_similares": True
+                }
+
+    def compare_ORB(self, pathsComparaciones: List[str], limiteCaracteristicas: int = 1000, saveOutput: bool = False, dirOutput: str = "resultados_ORB", workers: Optional[int] = None) -> List[Dict[str, Union[int, str]]]:
         """
         Compara imágenes usando ORB (Oriented FAST and Rotated BRIEF).
         
@@ -61,6 +555,7 @@ class ComparadorImagenes:
         :param limiteCaracteristicas: Número máximo de características a detectar.
         :param saveOutput: Si es True, guarda las imágenes con las coincidencias visualizadas.
         :param dirOutput: Directorio donde se guardarán las imágenes de salida si saveOutput es True.
+        :param workers: Si es mayor a 1, número de procesos en paralelo para comparar las imágenes.
         :return: Lista de diccionarios con resultados de comparación.
         Cada diccionario contiene:
             - "imagen": Ruta de la imagen comparada.
@@ -70,104 +565,352 @@ class ComparadorImagenes:
             - "porcentaje_coincidencias": Porcentaje de coincidencias respecto al total de puntos clave.
             - "fecha_modificacion": Indica la ultima vez que se modifico el archivo
             - "pathOutput": Ruta donde se guardó la imagen con las coincidencias (si saveOutput es True).
+            - "vista_previa": Array RGB con las coincidencias en tamaño reducido (solo si saveOutput es True y el
+              escritor tiene tamanoVistaPrevia).
         """
-        imagenOriginal = cv2.imread(self.pathOriginal, cv2.IMREAD_GRAYSCALE)
-        orb = cv2.ORB_create(limiteCaracteristicas)
-        kp1, des1 = orb.detectAndCompute(imagenOriginal, None)
-        results = []
+        return list(self.iter_compare_ORB(pathsComparaciones, limiteCaracteristicas, saveOutput, dirOutput, workers))
 
+    def iter_compare_ORB(self, pathsComparaciones: Iterable[str], limiteCaracteristicas: int = 1000, saveOutput: bool = False,
+                         dirOutput: str = "resultados_ORB", workers: Optional[int] = None, ventana: Optional[int] = None,
+                         ordenado: bool = True) -> Iterator[Dict[str, Union[int, str]]]:
+        """
+        Igual que compare_ORB, pero acepta cualquier iterable de rutas y devuelve cada resultado apenas está listo.
+        :param ventana: Máximo de imágenes en proceso a la vez cuando workers > 1 (por defecto 4 por proceso).
+        :param ordenado: Si es False, con workers > 1 los resultados salen en el orden en que terminan.
+        """
+        imagenOriginal, kp1, des1 = self._caracteristica_original(
+            ("ORB", limiteCaracteristicas), lambda: self._ORB(self.pathOriginal, limiteCaracteristicas)
+        )
         if saveOutput:
             os.makedirs(dirOutput, exist_ok=True)
 
-        for path in pathsComparaciones:
-            imagenTest = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
-            kp2, des2 = orb.detectAndCompute(imagenTest, None)
+        parametros = {"limiteCaracteristicas": limiteCaracteristicas, "saveOutput": saveOutput, "dirOutput": dirOutput}
+        yield from self._iterar("_comparar_ORB_una", pathsComparaciones, (imagenOriginal, kp1, des1), parametros,
+                                workers, ventana, ordenado)
+        if saveOutput and self.escritor is not None:
+            self.escritor.esperar()
+
+    def _comparar_ORB_una(self, path: str, referencia: Tuple[Optional[np.ndarray], tuple, np.ndarray],
+                          limiteCaracteristicas: int, saveOutput: bool, dirOutput: str) -> Dict[str, Union[int, str]]:
+        imagenTest, kp2, des2 = self._ORB(path, limiteCaracteristicas)
+        return self._resultado_ORB(path, referencia, (imagenTest, kp2, des2), saveOutput, dirOutput)
 
+    def _resultado_ORB(self, path: str, referencia: Tuple[Optional[np.ndarray], tuple, np.ndarray],
+                       candidata: Tuple[Optional[np.ndarray], tuple, np.ndarray], saveOutput: bool,
+                       dirOutput: str) -> Dict[str, Union[int, str]]:
+        imagenOriginal, kp1, des1 = referencia
+        imagenTest, kp2, des2 = candidata
+
+        medir = self._medir
+        with medir("comparacion"):
             bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
             coincidencias = bf.match(des1, des2)
-            coincidencias = sorted(coincidencias, key=lambda x: x.distance)
+        with medir("filtrado"):
+            coincidencias, buenas_coincidencias = filtrar_coincidencias(coincidencias)
 
-            # Filtrado de coincidencias buenas (distancia menor a 1.5 * mediana)
-            distancias = [m.distance for m in coincidencias]
-            if distancias:
-                umbral = np.median(distancias) * 1.5
-                buenas_coincidencias = [m for m in coincidencias if m.distance < umbral]
+        pathOutput = None
+        vistaPrevia = None
+        if saveOutput:
+            pathOutput = f"{dirOutput}/diferencia_orb_{os.path.basename(path)}"
+            with medir("decodificacion"):
+                if imagenOriginal is None:
+                    imagenOriginal = self._caracteristica_original(
+                        "gris", lambda: leer_imagen(self.pathOriginal, "ORB", gris=True, rapida=self.decodificacionRapida)
+                    )
+                if imagenTest is None:
+                    imagenTest = leer_imagen(path, "ORB", gris=True, rapida=self.decodificacionRapida)
+            if self.escritor is None:
+                with medir("dibujo"):
+                    imagenConComparaciones = cv2.drawMatches(
+                        imagenOriginal, kp1, imagenTest, kp2, buenas_coincidencias[:50], None,
+                        flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS
+                    )
+                with medir("escritura"):
+                    cv2.imwrite(pathOutput, imagenConComparaciones)
             else:
-                buenas_coincidencias = []
+                # El dibujo y la escritura ocurren en el hilo del escritor; acá solo se mide lo que tarda en encolar
+                with medir("escritura"):
+                    pathOutput = self.escritor.enviar(pathOutput, imagenOriginal, kp1, imagenTest, kp2,
+                                                      buenas_coincidencias[:50])
+                with medir("dibujo"):
+                    vistaPrevia = self.escritor.vista_previa(imagenOriginal, kp1, imagenTest, kp2,
+                                                             buenas_coincidencias[:50])
 
-            pathOutput = None
-            if saveOutput:
-                pathOutput = f"{dirOutput}/diferencia_orb_{os.path.basename(path)}"
-                imagenConComparaciones = cv2.drawMatches(
-                    imagenOriginal, kp1, imagenTest, kp2, buenas_coincidencias[:50], None,
-                    flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS
-                )
-                cv2.imwrite(pathOutput, imagenConComparaciones)
-
-            timeStamp = os.path.getmtime(path)
-            fechaMod = datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S")
-
-            total_kp1 = len(kp1)
-            total_kp2 = len(kp2)
-            total_kp = min(total_kp1, total_kp2)
-
-            porcentaje_coincidencias = round((len(coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
-            porcentaje_buenas = round((len(buenas_coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
-
-            results.append({
-                "imagen": path,
-                "coincidencias": len(coincidencias),
-                "coincidencias_buenas": len(buenas_coincidencias),
-                "total_keypoints_original": total_kp1,
-                "total_keypoints_comparada": total_kp2,
-                "porcentaje_coincidencias": f"{porcentaje_coincidencias}%",
-                "porcentaje_buenas": f"{porcentaje_buenas}%",
-                "fecha_modificacion": fechaMod,
-                "pathOutput": pathOutput
-            })
-        return results
+        timeStamp = os.path.getmtime(path)
+        fechaMod = datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S")
+
+        total_kp1 = len(kp1)
+        total_kp2 = len(kp2)
+        total_kp = min(total_kp1, total_kp2)
+
+        porcentaje_coincidencias = round((len(coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
+        porcentaje_buenas = round((len(buenas_coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
+
+        resultado = {
+            "imagen": path,
+            "coincidencias": len(coincidencias),
+            "coincidencias_buenas": len(buenas_coincidencias),
+            "total_keypoints_original": total_kp1,
+            "total_keypoints_comparada": total_kp2,
+            "porcentaje_coincidencias": f"{porcentaje_coincidencias}%",
+            "porcentaje_buenas": f"{porcentaje_buenas}%",
+            "fecha_modificacion": fechaMod,
+            "pathOutput": pathOutput
+        }
+        if vistaPrevia is not None:
+            resultado["vista_previa"] = vistaPrevia
+        return resultado
     
     #Compara el color de las imagenes, obtiene el histograma de cada imagen donde ve cuántos píxeles hay de cada color o intensidad
-    def compare_histogramas(self, pathsComparaciones: List[str], metodo=cv2.HISTCMP_CORREL, umbral: float = 0.8) -> List[Dict[str, Union[str, float, bool]]]:
+    def compare_histogramas(self, pathsComparaciones: List[str], metodo=HISTCMP_CORREL, umbral: float = 0.8, workers: Optional[int] = None) -> List[Dict[str, Union[str, float, bool]]]:
         """"
         Compara imágenes usando histogramas de color (en espacio HSV).
         :param pathsComparaciones: Lista de rutas de imágenes a comparar con la imagen original.
-        :param metodo: Método de comparación (ej: cv2.HISTCMP_CORREL, cv2.HISTCMP_CHISQR, etc.)
+        :param metodo: Método de comparación (ej: HISTCMP_CORREL, HISTCMP_CHISQR, etc.)
         :param umbral: Valor mínimo para considerar que las imágenes son similares.
+        :param workers: Si es mayor a 1, número de procesos en paralelo para comparar las imágenes.
         :return: Lista de diccionarios con los resultados.
         Cada diccionario contiene:
             - "imagen": Ruta de la imagen comparada.
             - "similitud": Valor de similitud entre 0 y 1 (1.0: identicas, 0.8-0.99: muy similiares, 0.5-0.9: parecidas, < 0.5: distintas).
             - "son_similares": Booleano indicando si la imagen es similar a la original según el umbral.
         """
-        resultados = []
+        return list(self.iter_compare_histogramas(pathsComparaciones, metodo, umbral, workers))
 
-        # Cargar y convertir imagen original
-        imgOriginal = cv2.imread(self.pathOriginal)
-        hsvOriginal = cv2.cvtColor(imgOriginal, cv2.COLOR_BGR2HSV)
-        histOriginal = cv2.calcHist([hsvOriginal], [0, 1], None, [50, 60], [0, 180, 0, 256])
-        cv2.normalize(histOriginal, histOriginal, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
+    def iter_compare_histogramas(self, pathsComparaciones: Iterable[str], metodo=HISTCMP_CORREL, umbral: float = 0.8,
+                                 workers: Optional[int] = None, ventana: Optional[int] = None,
+                                 ordenado: bool = True) -> Iterator[Dict[str, Union[str, float, bool]]]:
+        """
+        Igual que compare_histogramas, pero acepta cualquier iterable de rutas y devuelve cada resultado apenas está listo.
+        :param ventana: Máximo de imágenes en proceso a la vez cuando workers > 1 (por defecto 4 por proceso).
+        :param ordenado: Si es False, con workers > 1 los resultados salen en el orden en que terminan.
+        """
+        # Histograma de la imagen original (se calcula una sola vez por instancia)
+        histOriginal = self._caracteristica_original("histograma", lambda: self._histograma(self.pathOriginal))
+        parametros = {"metodo": metodo, "umbral": umbral}
+        yield from self._iterar("_comparar_histograma_una", pathsComparaciones, histOriginal, parametros,
+                                workers, ventana, ordenado)
 
-        for path in pathsComparaciones:
-            img = cv2.imread(path)
-            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-            hist = cv2.calcHist([hsv], [0, 1], None, [50, 60], [0, 180, 0, 256])
-            cv2.normalize(hist, hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
+    def _comparar_histograma_una(self, path: str, histOriginal: np.ndarray, metodo: int, umbral: float) -> Dict[str, Union[str, float, bool]]:
+        return self._resultado_histograma(path, histOriginal, self._histograma(path), metodo, umbral)
 
+    def _resultado_histograma(self, path: str, histOriginal: np.ndarray, hist: np.ndarray, metodo: int,
+                              umbral: float) -> Dict[str, Union[str, float, bool]]:
+        with self._medir("comparacion"):
             similitud = cv2.compareHist(histOriginal, hist, metodo)
 
-            es_similar = False
-            if metodo == cv2.HISTCMP_CORREL:
-                es_similar = similitud >= umbral
-            elif metodo in [cv2.HISTCMP_CHISQR, cv2.HISTCMP_BHATTACHARYYA]:
-                es_similar = similitud <= umbral
-            elif metodo == cv2.HISTCMP_INTERSECT:
-                es_similar = similitud >= umbral  # A mayor intersección, más parecido
-
-            resultados.append({
-                "imagen": path,
-                "similitud": round(similitud, 4), #1.0: identicas, 0.8-0.99: muy similiares, 0.5-0.9: parecidas, < 0.5: distintas
-                "son_similares": es_similar  
-            })
-
-        return resultados
\ No newline at end of file
+        es_similar = False
+        if metodo == HISTCMP_CORREL:
+            es_similar = similitud >= umbral
+        elif metodo in [HISTCMP_CHISQR, HISTCMP_BHATTACHARYYA]:
+            es_similar = similitud <= umbral
+        elif metodo == HISTCMP_INTERSECT:
+            es_similar = similitud >= umbral  # A mayor intersección, más parecido
+
+        return {
+            "imagen": path,
+            "similitud": round(similitud, 4), #1.0: identicas, 0.8-0.99: muy similiares, 0.5-0.9: parecidas, < 0.5: distintas
+            "son_similares": es_similar  
+        }
+
+    def compare_all(self, pathsComparaciones: List[str], algoritmos: Iterable[str] = ALGORITMOS, limite: int = 10,
+                    limiteCaracteristicas: int = 1000, metodo=HISTCMP_CORREL, umbral: float = 0.8,
+                    saveOutput: bool = False, dirOutput: str = "resultados_ORB",
+                    workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Compara cada imagen con varios algoritmos a la vez, leyendo y decodificando cada archivo una sola vez.
+
+        Cada archivo se lee y decodifica una vez (ver VistasImagen) y de ese buffer se derivan la vista en escala de
+        grises para pHash y ORB y la vista HSV para el histograma, en lugar de decodificarlo una vez por algoritmo.
+        Como el pHash y ORB parten de la conversión BGR a gris de OpenCV (y no de PIL ni de la lectura directa en
+        escala de grises), sus valores pueden diferir levemente de compare_pHash y compare_ORB.
+        :param pathsComparaciones: Lista de rutas de imágenes a comparar con la imagen original.
+        :param algoritmos: Algoritmos a ejecutar, entre "pHash", "histograma" y "ORB".
+        :param limite: Igual que en compare_pHash.
+        :param limiteCaracteristicas, saveOutput, dirOutput: Igual que en compare_ORB.
+        :param metodo, umbral: Igual que en compare_histogramas.
+        :param workers: Si es mayor a 1, número de procesos en paralelo para comparar las imágenes.
+        :return: Lista de diccionarios, uno por imagen, con:
+            - "imagen": Ruta de la imagen comparada.
+            - "fecha_modificacion": Indica la ultima vez que se modifico el archivo
+            - Una sección por algoritmo pedido ("pHash", "histograma", "ORB") con los mismos campos que devuelve el
+              método correspondiente.
+        """
+        return list(self.iter_compare_all(pathsComparaciones, algoritmos, limite, limiteCaracteristicas, metodo, umbral,
+                                          saveOutput, dirOutput, workers))
+
+    def iter_compare_all(self, pathsComparaciones: Iterable[str], algoritmos: Iterable[str] = ALGORITMOS, limite: int = 10,
+                         limiteCaracteristicas: int = 1000, metodo=HISTCMP_CORREL, umbral: float = 0.8,
+                         saveOutput: bool = False, dirOutput: str = "resultados_ORB", workers: Optional[int] = None,
+                         ventana: Optional[int] = None, ordenado: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que compare_all, pero acepta cualquier iterable de rutas y devuelve cada resultado apenas está listo.
+        """
+        algoritmos = tuple(algoritmos)
+        desconocidos = set(algoritmos) - set(ALGORITMOS)
+        if desconocidos:
+            raise ValueError(f"Algoritmos no reconocidos: {', '.join(sorted(desconocidos))}")
+
+        referencia = {}
+        if "pHash" in algoritmos:
+            referencia["pHash"] = self._caracteristica_original("pHash", lambda: self._pHash(self.pathOriginal))
+        if "histograma" in algoritmos:
+            referencia["histograma"] = self._caracteristica_original("histograma", lambda: self._histograma(self.pathOriginal))
+        if "ORB" in algoritmos:
+            referencia["ORB"] = self._caracteristica_original(
+                ("ORB", limiteCaracteristicas), lambda: self._ORB(self.pathOriginal, limiteCaracteristicas)
+            )
+            if saveOutput:
+                os.makedirs(dirOutput, exist_ok=True)
+
+        parametros = {"algoritmos": algoritmos, "limite": limite, "limiteCaracteristicas": limiteCaracteristicas,
+                      "metodo": metodo, "umbral": umbral, "saveOutput": saveOutput, "dirOutput": dirOutput}
+        yield from self._iterar("_comparar_todo_una", pathsComparaciones, referencia, parametros,
+                                workers, ventana, ordenado)
+        if saveOutput and "ORB" in algoritmos and self.escritor is not None:
+            self.escritor.esperar()
+
+    def _comparar_todo_una(self, path: str, referencia: Dict[str, Any], algoritmos: Tuple[str, ...], limite: int,
+                           limiteCaracteristicas: int, metodo: int, umbral: float, saveOutput: bool,
+                           dirOutput: str) -> Dict[str, Any]:
+        # Si todas las características están en la cache el archivo ni siquiera se decodifica
+        medir = self._medir
+        vistas = VistasImagen(path, algoritmos, self.decodificacionRapida, medir)
+        # Las características calculadas desde las vistas se guardan en la cache aparte de las de los otros métodos;
+        # en el modo rápido también dependen de la reducción elegida según los algoritmos pedidos
+        sufijo = f"vistas{vistas.ladoMinimo}" if self.decodificacionRapida else "vistas"
+        timeStamp = os.path.getmtime(path)
+        resultado = {
+            "imagen": path,
+            "fecha_modificacion": datetime.fromtimestamp(timeStamp).strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        def extraer(calcular: Callable[[], Any]) -> Callable[[], Any]:
+            # La decodificación que dispare la vista se descuenta de la extracción (ver Instrumentacion.etapa)
+            def calcular_medido():
+                with medir("extraccion"):
+                    return calcular()
+            return calcular_medido
+
+        if "pHash" in algoritmos:
+            pHashTest = self._con_cache(f"pHash-{sufijo}", path,
+                                        extraer(lambda: phash(Image.fromarray(vistas.gris))))
+            resultado["pHash"] = self._resultado_pHash(path, referencia["pHash"], pHashTest, limite)
+
+        if "histograma" in algoritmos:
+            hist = self._con_cache(f"histograma-{sufijo}", path, extraer(lambda: histograma_hsv(vistas.hsv)))
+            resultado["histograma"] = self._resultado_histograma(path, referencia["histograma"], hist, metodo, umbral)
+
+        if "ORB" in algoritmos:
+            kp2, des2 = self._con_cache(f"{self._tipo_ORB(limiteCaracteristicas)}-{sufijo}", path,
+                                        extraer(lambda: detectar_ORB(vistas.gris, limiteCaracteristicas,
+                                                                     self.ladoMosaicoORB)))
+            imagenTest = vistas.gris if saveOutput else None
+            resultado["ORB"] = self._resultado_ORB(path, referencia["ORB"], (imagenTest, kp2, des2), saveOutput, dirOutput)
+
+        return resultado
+
+    def compare_cascada(self, pathsComparaciones: List[str], bandaPHash: Tuple[int, int] = (6, 20),
+                        bandaHistograma: Tuple[float, float] = (0.5, 0.9), umbralORB: float = 50.0,
+                        metodo=HISTCMP_CORREL, limiteCaracteristicas: int = 1000,
+                        workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Compara en cascada: pHash primero, histograma solo para las imágenes dudosas y ORB solo si sigue sin decidirse.
+
+        ORB es uno o dos órdenes de magnitud más caro que pHash, pero para la mayoría de las imágenes la diferencia de
+        pHash ya alcanza: si es muy chica son similares y si es muy grande son distintas. Cada etapa decide las
+        imágenes que quedan fuera de su banda de incertidumbre y pasa a la siguiente solo las que quedan dentro.
+        Al terminar, self.estadisticas_cascada tiene cuántas imágenes evaluó, aceptó, descartó y escaló cada etapa,
+        para poder ajustar las bandas.
+        :param pathsComparaciones: Lista de rutas de imágenes a comparar con la imagen original.
+        :param bandaPHash: (a, b): diferencia <= a es similar, > b es distinta, entre ambas pasa al histograma.
+        :param bandaHistograma: (bajo, alto) en las unidades de metodo. Con CORREL o INTERSECT, similitud >= alto es
+        similar y < bajo es distinta; con CHISQR o BHATTACHARYYA, <= bajo es similar y > alto es distinta. Entre
+        ambos pasa a ORB.
+        :param umbralORB: Porcentaje mínimo de coincidencias buenas (como "porcentaje_buenas") para ser similar.
+        :param metodo: Método de comparación de histogramas.
+        :param limiteCaracteristicas: Número máximo de características ORB.
+        :param workers: Si es mayor a 1, número de procesos en paralelo para comparar las imágenes.
+        :return: Lista de diccionarios con:
+            - "imagen": Ruta de la imagen comparada.
+            - "son_similares": Veredicto final.
+            - "etapa_decisiva": "pHash", "histograma" u "ORB", la etapa que decidió.
+            - "pHash", "histograma", "ORB": Resultado de cada etapa que se ejecutó, con los campos del método
+              correspondiente.
+        """
+        return list(self.iter_compare_cascada(pathsComparaciones, bandaPHash, bandaHistograma, umbralORB, metodo,
+                                              limiteCaracteristicas, workers))
+
+    def iter_compare_cascada(self, pathsComparaciones: Iterable[str], bandaPHash: Tuple[int, int] = (6, 20),
+                             bandaHistograma: Tuple[float, float] = (0.5, 0.9), umbralORB: float = 50.0,
+                             metodo=HISTCMP_CORREL, limiteCaracteristicas: int = 1000,
+                             workers: Optional[int] = None, ventana: Optional[int] = None,
+                             ordenado: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que compare_cascada, pero acepta cualquier iterable de rutas y devuelve cada resultado apenas está listo.
+        self.estadisticas_cascada se actualiza a medida que salen los resultados.
+        """
+        referencia = {
+            "pHash": self._caracteristica_original("pHash", lambda: self._pHash(self.pathOriginal)),
+            "histograma": self._caracteristica_original("histograma", lambda: self._histograma(self.pathOriginal)),
+            # Las características ORB de la original solo se calculan si alguna imagen llega a esa etapa
+            "ORB": None,
+        }
+        parametros = {"bandaPHash": bandaPHash, "bandaHistograma": bandaHistograma, "umbralORB": umbralORB,
+                      "metodo": metodo, "limiteCaracteristicas": limiteCaracteristicas}
+
+        etapas = ("pHash", "histograma", "ORB")
+        self.estadisticas_cascada = {"total": 0}
+        for etapa in etapas:
+            self.estadisticas_cascada[etapa] = {"evaluadas": 0, "similares": 0, "distintas": 0, "escaladas": 0}
+
+        for resultado in self._iterar("_comparar_cascada_una", pathsComparaciones, referencia, parametros,
+                                      workers, ventana, ordenado):
+            self.estadisticas_cascada["total"] += 1
+            for etapa in etapas:
+                if etapa not in resultado:
+                    break
+                contadores = self.estadisticas_cascada[etapa]
+                contadores["evaluadas"] += 1
+                if resultado["etapa_decisiva"] != etapa:
+                    contadores["escaladas"] += 1
+                elif resultado["son_similares"]:
+                    contadores["similares"] += 1
+                else:
+                    contadores["distintas"] += 1
+            yield resultado
+
+    def _comparar_cascada_una(self, path: str, referencia: Dict[str, Any], bandaPHash: Tuple[int, int],
+                              bandaHistograma: Tuple[float, float], umbralORB: float, metodo: int,
+                              limiteCaracteristicas: int) -> Dict[str, Any]:
+        resultado = {"imagen": path}
+
+        resultado["pHash"] = self._comparar_pHash_una(path, referencia["pHash"], bandaPHash[0])
+        diferencia = resultado["pHash"]["diferencia"]
+        if diferencia <= bandaPHash[0] or diferencia > bandaPHash[1]:
+            resultado["son_similares"] = diferencia <= bandaPHash[0]
+            resultado["etapa_decisiva"] = "pHash"
+            return resultado
+
+        bajo, alto = bandaHistograma
+        umbralHistograma = alto if metodo in (HISTCMP_CORREL, HISTCMP_INTERSECT) else bajo
+        resultado["histograma"] = self._comparar_histograma_una(path, referencia["histograma"], metodo, umbralHistograma)
+        similitud = resultado["histograma"]["similitud"]
+        if metodo in (HISTCMP_CORREL, HISTCMP_INTERSECT):
+            decidida = similitud >= alto or similitud < bajo
+        else:
+            decidida = similitud <= bajo or similitud > alto
+        if decidida:
+            resultado["son_similares"] = bool(resultado["histograma"]["son_similares"])
+            resultado["etapa_decisiva"] = "histograma"
+            return resultado
+
+        referenciaORB = self._caracteristica_original(
+            ("ORB", limiteCaracteristicas), lambda: self._ORB(self.pathOriginal, limiteCaracteristicas)
+        )
+        resultado["ORB"] = self._comparar_ORB_una(path, referenciaORB, limiteCaracteristicas, False, "")
+        kpMinimo = min(resultado["ORB"]["total_keypoints_original"], resultado["ORB"]["total_keypoints_comparada"])
+        porcentajeBuenas = resultado["ORB"]["coincidencias_buenas"] / kpMinimo * 100 if kpMinimo else 0
+        resultado["son_similares"] = porcentajeBuenas >= umbralORB
+        resultado["etapa_decisiva"] = "ORB"
+        return resultado
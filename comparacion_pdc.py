@@ -1,10 +1,11 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import hashlib
-import io
-import numpy as np
-from skimage.metrics import structural_similarity as ssim
+from importacion_perezosa import ModuloPerezoso
+from integridad import calcular_hash_imagen, comparar_similitud_visual, UMBRALES_SSIM
+
+Image = ModuloPerezoso("PIL.Image")
+ImageTk = ModuloPerezoso("PIL.ImageTk")
+
 
 class VerificadorIntegridadImagenes(tk.Tk):
     def __init__(self):
@@ -18,6 +19,8 @@ class VerificadorIntegridadImagenes(tk.Tk):
         self.ruta_imagen_prueba = None
         self.hash_referencia = None
         self.hash_prueba = None
+        self.hash_pixeles_referencia = None
+        self.hash_pixeles_prueba = None
 
         self.marco_principal = tk.Frame(self, bg="#f0f0f0")
         self.marco_principal.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -109,6 +112,7 @@ class VerificadorIntegridadImagenes(tk.Tk):
             self.ruta_imagen_referencia = ruta_archivo
             self.mostrar_imagen(ruta_archivo, self.etiqueta_imagen_ref)
             self.hash_referencia = self.calcular_hash_imagen(ruta_archivo)
+            self.hash_pixeles_referencia = None
             self.etiqueta_hash_ref.config(text=f"Hash de Referencia: {self.hash_referencia[:16]}...")
             self.etiqueta_resultado.config(text="Cargue ambas imágenes y haga clic en 'Verificar Integridad'")
 
@@ -121,6 +125,7 @@ class VerificadorIntegridadImagenes(tk.Tk):
             self.ruta_imagen_prueba = ruta_archivo
             self.mostrar_imagen(ruta_archivo, self.etiqueta_imagen_prueba)
             self.hash_prueba = self.calcular_hash_imagen(ruta_archivo)
+            self.hash_pixeles_prueba = None
             self.etiqueta_hash_prueba.config(text=f"Hash de Prueba: {self.hash_prueba[:16]}...")
             self.etiqueta_resultado.config(text="Cargue ambas imágenes y haga clic en 'Verificar Integridad'")
 
@@ -140,29 +145,18 @@ class VerificadorIntegridadImagenes(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar la imagen: {str(e)}")
 
-    def calcular_hash_imagen(self, ruta_archivo):
+    def calcular_hash_imagen(self, ruta_archivo, modo="archivo"):
+        # Al cargar solo se hashean los bytes del archivo; los píxeles se hashean solo si los archivos difieren
         try:
-            with Image.open(ruta_archivo) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                buffer_bytes_img = io.BytesIO()
-                img.save(buffer_bytes_img, format='PNG')
-                bytes_img = buffer_bytes_img.getvalue()
-                objeto_hash = hashlib.sha256(bytes_img)
-                return objeto_hash.hexdigest()
+            return calcular_hash_imagen(ruta_archivo, modo)
         except Exception as e:
             messagebox.showerror("Error", f"Error al calcular el hash: {str(e)}")
             return None
 
     def comparar_similitud_visual(self, ruta1, ruta2):
         try:
-            img1 = Image.open(ruta1).convert('L')
-            img2 = Image.open(ruta2).convert('L')
-            img2 = img2.resize(img1.size, Image.LANCZOS)
-            arr1 = np.array(img1)
-            arr2 = np.array(img2)
-            score, _ = ssim(arr1, arr2, full=True)
-            return score
+            # Sin umbrales: el índice se muestra, así que tiene que ser el exacto
+            return comparar_similitud_visual(ruta1, ruta2)
         except Exception as e:
             messagebox.showerror("Error", f"Error al comparar imágenes: {str(e)}")
             return None
@@ -172,7 +166,16 @@ class VerificadorIntegridadImagenes(tk.Tk):
             messagebox.showwarning("Advertencia", "Por favor, cargue ambas imágenes primero.")
             return
 
-        if self.hash_referencia == self.hash_prueba:
+        if self.hash_referencia != self.hash_prueba:
+            # Archivos distintos pueden tener los mismos píxeles (otros metadatos o compresión sin pérdida)
+            if self.hash_pixeles_referencia is None:
+                self.hash_pixeles_referencia = self.calcular_hash_imagen(self.ruta_imagen_referencia, "pixeles")
+            if self.hash_pixeles_prueba is None:
+                self.hash_pixeles_prueba = self.calcular_hash_imagen(self.ruta_imagen_prueba, "pixeles")
+
+        if self.hash_referencia == self.hash_prueba or (
+                self.hash_pixeles_referencia is not None
+                and self.hash_pixeles_referencia == self.hash_pixeles_prueba):
             self.etiqueta_resultado.config(
                 text="✅ IMÁGENES IDÉNTICAS (hashes coinciden)",
                 fg="green",
@@ -181,10 +184,11 @@ class VerificadorIntegridadImagenes(tk.Tk):
         else:
             score = self.comparar_similitud_visual(self.ruta_imagen_referencia, self.ruta_imagen_prueba)
             if score is not None:
-                if score > 0.95:
+                similares, muy_similares = UMBRALES_SSIM[0], UMBRALES_SSIM[1]
+                if score > muy_similares:
                     texto = f"🟡 Muy similares visualmente (SSIM={score:.2f})"
                     color = "orange"
-                elif score > 0.75:
+                elif score > similares:
                     texto = f"🟠 Similares, pero con diferencias (SSIM={score:.2f})"
                     color = "darkorange"
                 else:
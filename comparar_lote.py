@@ -0,0 +1,151 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from comparacion import ComparadorImagenes, EXTENSIONES_IMAGEN, listar_imagenes
+
+ALGORITMOS_LOTE = ("pHash", "ORB", "histograma", "todos")
+
+
+def expandir_entradas(entradas: Iterable[str]) -> Iterator[str]:
+    """
+    Convierte archivos, directorios y patrones glob en rutas de imágenes, de a una y sin armar la lista completa.
+        - "-": lee una ruta por línea de la entrada estándar (ej: la salida de find).
+        - Directorio: se recorre recursivamente con listar_imagenes.
+        - Archivo existente: se usa tal cual, aunque su extensión no sea de imagen.
+        - Ruta sin comodines que no existe: también se usa tal cual, así la comparación la reporta como error en
+          lugar de saltearla en silencio.
+        - Cualquier otra cosa se trata como patrón glob ("**" recorre subdirectorios); solo se toman los archivos con
+          extensión de imagen. Si no coincide con ningún archivo se avisa por la salida de errores.
+    """
+    for entrada in entradas:
+        if entrada == "-":
+            for linea in sys.stdin:
+                ruta = linea.rstrip("\r\n")
+                if ruta:
+                    yield ruta
+        elif os.path.isdir(entrada):
+            yield from listar_imagenes(entrada)
+        elif os.path.isfile(entrada) or not glob.has_magic(entrada):
+            yield entrada
+        else:
+            coincidencias = 0
+            for ruta in glob.iglob(entrada, recursive=True):
+                if ruta.lower().endswith(EXTENSIONES_IMAGEN) and os.path.isfile(ruta):
+                    coincidencias += 1
+                    yield ruta
+            if not coincidencias:
+                print(f"El patrón {entrada} no coincide con ninguna imagen", file=sys.stderr)
+
+
+class ComparadorLote(ComparadorImagenes):
+    """
+    ComparadorImagenes que no se detiene con los archivos que no se pueden leer: en lugar de lanzar la excepción
+    devuelve {"imagen": path, "error": mensaje} y sigue con el resto del lote.
+    """
+
+    def _funcion_comparacion(self, metodo: str) -> Callable[..., Dict[str, Any]]:
+        comparar = super()._funcion_comparacion(metodo)
+
+        def comparar_o_error(path: str, *args, **kwargs) -> Dict[str, Any]:
+            try:
+                return comparar(path, *args, **kwargs)
+            except Exception as e:
+                return {"imagen": path, "error": str(e).strip()}
+        return comparar_o_error
+
+
+def _valor_json(valor: Any) -> Any:
+    # Los tipos de numpy (bool_, float32, ...) que quedan en los resultados se convierten a sus equivalentes de Python
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no se puede convertir a JSON")
+
+
+def resultado_json(resultado: Dict[str, Any]) -> str:
+    """
+    Serializa un resultado en una línea JSON, sin los campos que no son datos (la vista previa de ORB).
+    """
+    resultado = {clave: valor for clave, valor in resultado.items() if clave != "vista_previa"}
+    if isinstance(resultado.get("ORB"), dict):
+        # En compare_all la vista previa está dentro de la sección de ORB
+        resultado["ORB"] = {clave: valor for clave, valor in resultado["ORB"].items() if clave != "vista_previa"}
+    return json.dumps(resultado, ensure_ascii=False, default=_valor_json)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compara una imagen original con muchas imágenes y escribe un resultado JSON por línea."
+    )
+    parser.add_argument("original", help="Imagen original.")
+    parser.add_argument("entradas", nargs="+",
+                        help="Archivos, directorios (recursivos), patrones glob o '-' para leer rutas de stdin.")
+    parser.add_argument("--algoritmo", choices=ALGORITMOS_LOTE, default="pHash",
+                        help="Algoritmo de comparación ('todos' lee cada imagen una vez para los tres).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo.")
+    parser.add_argument("--ventana", type=int, help="Máximo de imágenes en proceso a la vez (por defecto 4 por proceso).")
+    parser.add_argument("--ordenado", action="store_true",
+                        help="Escribe los resultados en el orden de las entradas y no en el que terminan.")
+    parser.add_argument("--limite", type=int, default=10, help="Diferencia de pHash máxima para ser similares.")
+    parser.add_argument("--limite-caracteristicas", type=int, default=1000, help="Keypoints ORB por imagen.")
+    parser.add_argument("--mosaicos", type=int, metavar="LADO",
+                        help="Detecta ORB por mosaicos de LADO píxeles en las imágenes más grandes (memoria acotada).")
+    parser.add_argument("--umbral", type=float, default=0.8, help="Correlación de histograma mínima para ser similares.")
+    parser.add_argument("--cache", help="Archivo SQLite de cache de características (ver cache_caracteristicas.py).")
+    parser.add_argument("--rapida", action="store_true", help="Decodifica las imágenes grandes a escala reducida.")
+    parser.add_argument("--salida", default="-", help="Archivo JSON lines de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache:
+        from cache_caracteristicas import CacheCaracteristicas
+        cache = CacheCaracteristicas(args.cache)
+    comparador = ComparadorLote(args.original, cache=cache, decodificacionRapida=args.rapida,
+                                ladoMosaicoORB=args.mosaicos)
+    paths = expandir_entradas(args.entradas)
+    opciones = {"workers": args.workers, "ventana": args.ventana, "ordenado": args.ordenado}
+    if args.algoritmo == "pHash":
+        resultados = comparador.iter_compare_pHash(paths, args.limite, **opciones)
+    elif args.algoritmo == "ORB":
+        resultados = comparador.iter_compare_ORB(paths, args.limite_caracteristicas, **opciones)
+    elif args.algoritmo == "histograma":
+        resultados = comparador.iter_compare_histogramas(paths, umbral=args.umbral, **opciones)
+    else:
+        resultados = comparador.iter_compare_all(paths, limite=args.limite,
+                                                 limiteCaracteristicas=args.limite_caracteristicas,
+                                                 umbral=args.umbral, **opciones)
+
+    imagenes = 0
+    errores = 0
+    inicio = time.perf_counter()
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        for resultado in resultados:
+            imagenes += 1
+            if "error" in resultado:
+                errores += 1
+                print(f"No se pudo comparar {resultado['imagen']}: {resultado['error']}", file=sys.stderr)
+            salida.write(resultado_json(resultado) + "\n")
+            # Una línea por resultado apenas está listo, para que el siguiente comando del pipe no espere
+            salida.flush()
+    except BrokenPipeError:
+        # El comando siguiente del pipe cerró la entrada (ej: head): se termina sin error. La salida estándar se
+        # apunta a os.devnull para que Python no vuelva a fallar al vaciarla cuando termina
+        resultados.close()
+        if salida is sys.stdout:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+    segundos = time.perf_counter() - inicio
+    velocidad = imagenes / segundos if segundos > 0 else 0.0
+    print(f"{imagenes} imágenes ({errores} con error) en {segundos:.2f} s: {velocidad:.1f} imágenes/s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from comparacion import listar_imagenes
+from phash_lote import leer_miniatura, phash_miniaturas
+
+# Imágenes por lote: cada lote se lee en un proceso y sus pHash se calculan en una sola pasada vectorizada
+TAMANO_LOTE_HASH = 64
+
+
+def _hashes_lote(pathsImagenes: List[str]) -> List[Optional[int]]:
+    miniaturas = []
+    for path in pathsImagenes:
+        try:
+            miniaturas.append(leer_miniatura(path))
+        except Exception as e:
+            print(f"No se pudo calcular el hash de {path}: {e}", file=sys.stderr)
+            miniaturas.append(None)
+    leidas = [miniatura for miniatura in miniaturas if miniatura is not None]
+    hashes = iter(phash_miniaturas(np.stack(leidas)).tolist() if leidas else [])
+    return [None if miniatura is None else next(hashes) for miniatura in miniaturas]
+
+
+def hashear_corpus(pathsImagenes: Iterable[str], workers: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Calcula el pHash de cada imagen una sola vez y los empaqueta en un array uint64 (8 bytes por imagen).
+    Las imágenes se procesan de a lotes de TAMANO_LOTE_HASH con phash_lote.phash_miniaturas (mismo resultado que
+    imagehash.phash). Las que no se pueden leer se informan por stderr y se omiten.
+    :param pathsImagenes: Rutas de las imágenes.
+    :param workers: Si es mayor a 1, número de procesos para calcular los hashes en paralelo.
+    :return: Tupla (rutas, hashes) donde hashes[i] es el pHash de rutas[i].
+    """
+    pathsImagenes = list(pathsImagenes)
+    lotes = [pathsImagenes[i:i + TAMANO_LOTE_HASH] for i in range(0, len(pathsImagenes), TAMANO_LOTE_HASH)]
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            valoresLotes = list(pool.map(_hashes_lote, lotes))
+    else:
+        valoresLotes = [_hashes_lote(lote) for lote in lotes]
+    valores = [valor for valoresLote in valoresLotes for valor in valoresLote]
+
+    rutas = [path for path, valor in zip(pathsImagenes, valores) if valor is not None]
+    hashes = np.array([valor for valor in valores if valor is not None], dtype=np.uint64)
+    return rutas, hashes
+
+
+class UnionFind:
+    """
+    Estructura union-find (conjuntos disjuntos) sobre arrays de numpy, con compresión de caminos y unión por tamaño.
+    """
+
+    def __init__(self, n: int):
+        self.padre = np.arange(n, dtype=np.int64)
+        self.tamano = np.ones(n, dtype=np.int64)
+
+    def buscar(self, x: int) -> int:
+        raiz = x
+        while self.padre[raiz] != raiz:
+            raiz = self.padre[raiz]
+        while self.padre[x] != raiz:
+            self.padre[x], x = raiz, self.padre[x]
+        return int(raiz)
+
+    def unir(self, a: int, b: int) -> None:
+        a, b = self.buscar(a), self.buscar(b)
+        if a == b:
+            return
+        if self.tamano[a] < self.tamano[b]:
+            a, b = b, a
+        self.padre[b] = a
+        self.tamano[a] += self.tamano[b]
+
+
+def agrupar_duplicados(hashes: np.ndarray, limite: int = 10, tamanoBloque: int = 2048) -> UnionFind:
+    """
+    Agrupa las imágenes cuyos pHash están a distancia de Hamming <= limite (de forma transitiva).
+
+    Las distancias de todos los pares se calculan por bloques de tamanoBloque x tamanoBloque con XOR + bitwise_count,
+    así la memoria usada no depende del tamaño del corpus (unos 9 bytes por par del bloque) y cada bloque entra en la
+    cache del procesador. Solo se recorren los bloques del triángulo superior porque la distancia es simétrica.
+    :param hashes: Array uint64 con un pHash por imagen.
+    :param limite: Distancia máxima para considerar dos imágenes duplicadas.
+    :param tamanoBloque: Cantidad de hashes por bloque.
+    :return: UnionFind donde las imágenes del mismo grupo comparten raíz.
+    """
+    n = len(hashes)
+    grupos = UnionFind(n)
+    for inicioA in range(0, n, tamanoBloque):
+        bloqueA = hashes[inicioA:inicioA + tamanoBloque]
+        for inicioB in range(inicioA, n, tamanoBloque):
+            bloqueB = hashes[inicioB:inicioB + tamanoBloque]
+            distancias = np.bitwise_count(bloqueA[:, None] ^ bloqueB[None, :])
+            cercanos = distancias <= limite
+            if inicioA == inicioB:
+                # En el bloque diagonal solo interesan los pares i < j
+                cercanos = np.triu(cercanos, k=1)
+            for i, j in zip(*np.nonzero(cercanos)):
+                grupos.unir(inicioA + int(i), inicioB + int(j))
+    return grupos
+
+
+def grupos_duplicados(rutas: List[str], hashes: np.ndarray, grupos: UnionFind) -> List[Dict[str, object]]:
+    """
+    Convierte el UnionFind en la lista de grupos con más de una imagen, ordenados por su primera imagen.
+    """
+    miembros: Dict[int, List[int]] = {}
+    for indice in range(len(rutas)):
+        miembros.setdefault(grupos.buscar(indice), []).append(indice)
+
+    resultado = []
+    for indices in miembros.values():
+        if len(indices) < 2:
+            continue
+        resultado.append({
+            "grupo": len(resultado),
+            "cantidad": len(indices),
+            "imagenes": [rutas[i] for i in indices],
+            "hashes": [f"{int(hashes[i]):016x}" for i in indices]
+        })
+    return resultado
+
+
+def deduplicar(pathsImagenes: Iterable[str], limite: int = 10, workers: Optional[int] = None,
+               tamanoBloque: int = 2048) -> List[Dict[str, object]]:
+    """
+    Busca grupos de imágenes casi duplicadas en un corpus: calcula los pHash una vez y agrupa por distancia.
+    :return: Lista de grupos; cada uno tiene "grupo", "cantidad", "imagenes" y "hashes".
+    """
+    rutas, hashes = hashear_corpus(pathsImagenes, workers)
+    grupos = agrupar_duplicados(hashes, limite, tamanoBloque)
+    return grupos_duplicados(rutas, hashes, grupos)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Agrupa imágenes casi duplicadas usando pHash.")
+    parser.add_argument("directorio", help="Directorio con las imágenes (se recorre recursivamente).")
+    parser.add_argument("--limite", type=int, default=10, help="Diferencia de pHash máxima entre duplicados.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos para calcular los hashes.")
+    parser.add_argument("--bloque", type=int, default=2048, help="Tamaño de bloque para las distancias.")
+    parser.add_argument("--salida", default="-", help="Archivo JSON lines de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    grupos = deduplicar(listar_imagenes(args.directorio), args.limite, args.workers, args.bloque)
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        for grupo in grupos:
+            salida.write(json.dumps(grupo, ensure_ascii=False) + "\n")
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+import sys
+import queue
+import threading
+from typing import List, Optional, Sequence, Tuple
+from importacion_perezosa import ModuloPerezoso
+
+cv2 = ModuloPerezoso("cv2")
+np = ModuloPerezoso("numpy")
+
+
+def _escalar_keypoint(kp: cv2.KeyPoint, escala: float, desplazamiento: float = 0) -> cv2.KeyPoint:
+    return cv2.KeyPoint(kp.pt[0] * escala + desplazamiento, kp.pt[1] * escala, kp.size * escala, kp.angle,
+                        kp.response, kp.octave, kp.class_id)
+
+
+def dibujar_coincidencias(imagen1: np.ndarray, kp1: Sequence[cv2.KeyPoint], imagen2: np.ndarray,
+                          kp2: Sequence[cv2.KeyPoint], coincidencias: Sequence[cv2.DMatch],
+                          escala: float = 1.0) -> np.ndarray:
+    """
+    Dibuja las coincidencias como cv2.drawMatches (imágenes lado a lado, sin los puntos sueltos), pero primero
+    achica las imágenes a la escala pedida y solo pasa a drawMatches los keypoints que aparecen en coincidencias.
+    Con escala 1.0 el resultado es el mismo que drawMatches con todos los keypoints.
+    """
+    if escala != 1.0:
+        imagen1 = cv2.resize(imagen1, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        imagen2 = cv2.resize(imagen2, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    kpDibujo1 = [_escalar_keypoint(kp1[m.queryIdx], escala) for m in coincidencias]
+    kpDibujo2 = [_escalar_keypoint(kp2[m.trainIdx], escala) for m in coincidencias]
+    coincidenciasDibujo = [cv2.DMatch(i, i, m.distance) for i, m in enumerate(coincidencias)]
+    return cv2.drawMatches(imagen1, kpDibujo1, imagen2, kpDibujo2, coincidenciasDibujo, None,
+                           flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
+
+
+class EscritorCoincidencias:
+    """
+    Dibuja y guarda en segundo plano las imágenes de coincidencias ORB de ComparadorImagenes (saveOutput=True).
+
+    Las imágenes se encolan y uno o más hilos las dibujan y codifican mientras el comparador sigue con las siguientes
+    (drawMatches, resize e imwrite liberan el GIL). La cola tiene un máximo de pendientes para que la memoria no crezca
+    si el disco es más lento que la comparación. Se puede achicar la salida (escala) y elegir la calidad JPEG o la
+    compresión PNG. En los procesos del pool (workers > 1) se dibuja y guarda en el mismo proceso, sin hilos, porque
+    esos procesos ya trabajan en paralelo.
+    Si se indica tamanoVistaPrevia, además se dibuja una versión chica que se devuelve en el resultado como
+    "vista_previa" (array RGB), para mostrarla sin volver a leer el archivo.
+    """
+
+    def __init__(self, escala: float = 1.0, calidadJPEG: int = 95, compresionPNG: int = 3,
+                 extension: Optional[str] = None, tamanoVistaPrevia: Optional[Tuple[int, int]] = None,
+                 hilos: int = 1, maximoPendientes: int = 16):
+        """
+        :param escala: Factor por el que se multiplican las dimensiones de las imágenes guardadas (ej: 0.5).
+        :param calidadJPEG: Calidad de los .jpg/.jpeg guardados (0-100).
+        :param compresionPNG: Nivel de compresión de los .png guardados (0-9; más alto es más chico y más lento).
+        :param extension: Si se indica (ej: ".jpg"), las imágenes se guardan con esa extensión en lugar de la de la
+        imagen comparada.
+        :param tamanoVistaPrevia: (ancho, alto) máximo de la vista previa en memoria, o None para no generarla.
+        :param hilos: Hilos que dibujan y guardan.
+        :param maximoPendientes: Imágenes encoladas como máximo; si se llena, el comparador espera.
+        """
+        self.escala = escala
+        self.calidadJPEG = calidadJPEG
+        self.compresionPNG = compresionPNG
+        self.extension = extension
+        self.tamanoVistaPrevia = tamanoVistaPrevia
+        self.hilos = hilos
+        self.maximoPendientes = maximoPendientes
+        self.errores: List[Tuple[str, str]] = []
+        self._pid = os.getpid()
+        self._cola: Optional[queue.Queue] = None
+        self._hilos: List[threading.Thread] = []
+
+    def __getstate__(self):
+        # Los hilos y la cola quedan en el proceso que creó el escritor
+        estado = self.__dict__.copy()
+        estado["_cola"] = None
+        estado["_hilos"] = []
+        estado["errores"] = []
+        return estado
+
+    def ruta_salida(self, pathOutput: str) -> str:
+        if self.extension:
+            return os.path.splitext(pathOutput)[0] + self.extension
+        return pathOutput
+
+    def _parametros_codificacion(self, pathOutput: str) -> List[int]:
+        extension = os.path.splitext(pathOutput)[1].lower()
+        if extension in (".jpg", ".jpeg"):
+            return [cv2.IMWRITE_JPEG_QUALITY, self.calidadJPEG]
+        if extension == ".png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.compresionPNG]
+        return []
+
+    def _guardar(self, pathOutput: str, imagen1: np.ndarray, kp1, imagen2: np.ndarray, kp2, coincidencias) -> None:
+        try:
+            imagen = dibujar_coincidencias(imagen1, kp1, imagen2, kp2, coincidencias, self.escala)
+            if not cv2.imwrite(pathOutput, imagen, self._parametros_codificacion(pathOutput)):
+                raise IOError("cv2.imwrite no pudo guardar la imagen")
+        except Exception as e:
+            print(f"No se pudo guardar {pathOutput}: {e}", file=sys.stderr)
+            self.errores.append((pathOutput, str(e)))
+
+    def _procesar_cola(self) -> None:
+        while True:
+            tarea = self._cola.get()
+            try:
+                if tarea is None:
+                    return
+                self._guardar(*tarea)
+            finally:
+                self._cola.task_done()
+
+    def enviar(self, pathOutput: str, imagen1: np.ndarray, kp1, imagen2: np.ndarray, kp2, coincidencias) -> str:
+        """
+        Encola el dibujo de las coincidencias y devuelve la ruta donde se va a guardar (ver extension).
+        El archivo está completo recién después de esperar().
+        """
+        pathOutput = self.ruta_salida(pathOutput)
+        # Los DMatch y KeyPoint se copian a tuplas para que la tarea no dependa de las listas del llamador
+        tarea = (pathOutput, imagen1, tuple(kp1), imagen2, tuple(kp2), tuple(coincidencias))
+        if os.getpid() != self._pid:
+            self._guardar(*tarea)
+            return pathOutput
+        if self._cola is None:
+            self._cola = queue.Queue(maxsize=max(1, self.maximoPendientes))
+            self._hilos = [threading.Thread(target=self._procesar_cola, daemon=True) for _ in range(max(1, self.hilos))]
+            for hilo in self._hilos:
+                hilo.start()
+        self._cola.put(tarea)
+        return pathOutput
+
+    def vista_previa(self, imagen1: np.ndarray, kp1, imagen2: np.ndarray, kp2, coincidencias) -> Optional[np.ndarray]:
+        """
+        Dibuja las coincidencias en un tamaño que entra en tamanoVistaPrevia (manteniendo la proporción).
+        :return: Array RGB, o None si no se configuró tamanoVistaPrevia.
+        """
+        if self.tamanoVistaPrevia is None:
+            return None
+        anchoMaximo, altoMaximo = self.tamanoVistaPrevia
+        ancho = imagen1.shape[1] + imagen2.shape[1]
+        alto = max(imagen1.shape[0], imagen2.shape[0])
+        escala = min(1.0, anchoMaximo / ancho, altoMaximo / alto)
+        imagen = dibujar_coincidencias(imagen1, kp1, imagen2, kp2, coincidencias, escala)
+        return cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
+
+    def esperar(self) -> None:
+        """
+        Espera a que se guarden todas las imágenes encoladas.
+        """
+        if self._cola is not None:
+            self._cola.join()
+
+    def cerrar(self) -> None:
+        """
+        Espera las imágenes pendientes y termina los hilos.
+        """
+        if self._cola is None:
+            return
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+        self._cola = None
+        self._hilos = []
@@ -0,0 +1,151 @@
+import os
+import cv2
+import numpy as np
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+from comparacion import calcular_ORB, filtrar_coincidencias
+
+# Parámetros del índice LSH de FLANN para descriptores binarios (ORB usa 256 bits = 32 bytes)
+FLANN_INDEX_LSH = 6
+PARAMETROS_LSH = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+
+
+class GaleriaORB:
+    """
+    Galería persistente de descriptores ORB para buscar qué imágenes de referencia contienen a una imagen de consulta.
+
+    La búsqueda tiene dos etapas. Primero los descriptores de la consulta se buscan en un índice LSH de FLANN con
+    todos los descriptores de la galería, y cada vecino cercano suma un voto para su imagen; así se eligen unas pocas
+    candidatas sin comparar contra toda la galería. Después las candidatas se verifican con el mismo BFMatcher
+    (NORM_HAMMING, crossCheck) y filtrado que compare_ORB, para que coincidencias y coincidencias_buenas signifiquen lo
+    mismo que allí.
+    """
+
+    def __init__(self, limiteCaracteristicas: int = 1000):
+        """
+        :param limiteCaracteristicas: Número máximo de características ORB por imagen.
+        """
+        self.limiteCaracteristicas = limiteCaracteristicas
+        self.imagenes: List[str] = []
+        self._descriptores: List[np.ndarray] = []
+        self._matcher = None
+
+    def __len__(self) -> int:
+        return len(self.imagenes)
+
+    def agregar(self, path: str) -> None:
+        """
+        Detecta los puntos clave ORB de la imagen y agrega sus descriptores a la galería.
+        El índice FLANN se vuelve a entrenar en la próxima consulta.
+        """
+        _, _, des = calcular_ORB(path, self.limiteCaracteristicas)
+        self.agregar_descriptores(path, des)
+
+    def agregar_descriptores(self, path: str, des: Optional[np.ndarray]) -> None:
+        self.imagenes.append(path)
+        self._descriptores.append(des if des is not None else np.empty((0, 32), dtype=np.uint8))
+        self._matcher = None
+
+    def agregar_imagenes(self, pathsImagenes: Iterable[str]) -> None:
+        for path in pathsImagenes:
+            self.agregar(path)
+
+    def _indice(self) -> cv2.FlannBasedMatcher:
+        if self._matcher is None:
+            matcher = cv2.FlannBasedMatcher(PARAMETROS_LSH, dict(checks=50))
+            # FLANN numera las imágenes en el orden en que se agregan; las que no tienen descriptores se saltean
+            self._indicesFlann = [i for i, des in enumerate(self._descriptores) if len(des)]
+            if self._indicesFlann:
+                matcher.add([self._descriptores[i] for i in self._indicesFlann])
+                matcher.train()
+            self._matcher = matcher
+        return self._matcher
+
+    def _votos(self, des: np.ndarray, vecinos: int, distanciaMaxima: float) -> np.ndarray:
+        """
+        Cuenta, para cada imagen de la galería, cuántos descriptores de la consulta tienen un vecino cercano en ella.
+        """
+        votos = np.zeros(len(self.imagenes), dtype=np.int64)
+        matcher = self._indice()
+        if not self._indicesFlann:
+            return votos
+        for vecinosDescriptor in matcher.knnMatch(des, k=vecinos):
+            # Cada descriptor vota una sola vez por imagen aunque tenga varios vecinos en ella
+            imagenesVotadas = {m.imgIdx for m in vecinosDescriptor if m.distance <= distanciaMaxima}
+            for imgIdx in imagenesVotadas:
+                votos[self._indicesFlann[imgIdx]] += 1
+        return votos
+
+    def consultar(self, pathImagen: str, k: int = 10, candidatos: int = 50, vecinos: int = 5,
+                  distanciaMaxima: float = 64) -> List[Dict[str, Union[int, str]]]:
+        """
+        Busca las k imágenes de la galería con más coincidencias buenas con pathImagen.
+        :param pathImagen: Ruta de la imagen de consulta.
+        :param k: Cantidad de resultados.
+        :param candidatos: Cantidad de imágenes preseleccionadas por el índice LSH que se verifican con BFMatcher.
+        :param vecinos: Vecinos que se buscan en el índice por cada descriptor de la consulta.
+        :param distanciaMaxima: Distancia de Hamming máxima para que un vecino cuente como voto.
+        :return: Lista de diccionarios con los campos de compare_ORB (sin pathOutput), más "votos_lsh", ordenada por
+        coincidencias_buenas de mayor a menor.
+        """
+        _, kp1, des1 = calcular_ORB(pathImagen, self.limiteCaracteristicas)
+        if des1 is None or not len(self.imagenes):
+            return []
+
+        votos = self._votos(des1, vecinos, distanciaMaxima)
+        preseleccion = [i for i in np.argsort(-votos, kind="stable")[:candidatos] if votos[i] > 0]
+
+        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        resultados = []
+        for i in preseleccion:
+            des2 = self._descriptores[i]
+            coincidencias, buenas_coincidencias = filtrar_coincidencias(bf.match(des1, des2))
+
+            total_kp1 = len(kp1)
+            total_kp2 = len(des2)
+            total_kp = min(total_kp1, total_kp2)
+            porcentaje_coincidencias = round((len(coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
+            porcentaje_buenas = round((len(buenas_coincidencias) / total_kp) * 100, 2) if total_kp > 0 else 0
+
+            path = self.imagenes[i]
+            fechaMod = None
+            if os.path.exists(path):
+                fechaMod = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+
+            resultados.append({
+                "imagen": path,
+                "coincidencias": len(coincidencias),
+                "coincidencias_buenas": len(buenas_coincidencias),
+                "total_keypoints_original": total_kp1,
+                "total_keypoints_comparada": total_kp2,
+                "porcentaje_coincidencias": f"{porcentaje_coincidencias}%",
+                "porcentaje_buenas": f"{porcentaje_buenas}%",
+                "fecha_modificacion": fechaMod,
+                "votos_lsh": int(votos[i])
+            })
+
+        resultados.sort(key=lambda r: (-r["coincidencias_buenas"], -r["coincidencias"]))
+        return resultados[:k]
+
+    def guardar(self, pathGaleria: str) -> None:
+        """
+        Guarda la galería en un .npz: todos los descriptores concatenados, el desplazamiento de cada imagen y las
+        rutas. El índice FLANN no se guarda, se vuelve a entrenar al cargar (es rápido comparado con detectar ORB).
+        """
+        cantidades = np.array([len(des) for des in self._descriptores], dtype=np.int64)
+        descriptores = (np.concatenate(self._descriptores) if self._descriptores
+                        else np.empty((0, 32), dtype=np.uint8))
+        np.savez(pathGaleria, descriptores=descriptores, cantidades=cantidades,
+                 imagenes=np.array(self.imagenes, dtype=str),
+                 limiteCaracteristicas=np.array(self.limiteCaracteristicas))
+
+    @classmethod
+    def cargar(cls, pathGaleria: str) -> "GaleriaORB":
+        with np.load(pathGaleria, allow_pickle=False) as archivo:
+            galeria = cls(int(archivo["limiteCaracteristicas"]))
+            descriptores = archivo["descriptores"]
+            inicio = 0
+            for path, cantidad in zip(archivo["imagenes"], archivo["cantidades"]):
+                galeria.agregar_descriptores(str(path), descriptores[inicio:inicio + cantidad])
+                inicio += cantidad
+        return galeria
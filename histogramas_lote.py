@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+from typing import Dict, Iterable, List, Union
+from comparacion import calcular_histograma
+
+# En CORREL e INTERSECT un valor mayor indica más parecido; en CHISQR y BHATTACHARYYA, uno menor
+METODOS_MAYOR_ES_MEJOR = (cv2.HISTCMP_CORREL, cv2.HISTCMP_INTERSECT)
+
+
+class MotorHistogramas:
+    """
+    Compara un histograma de referencia contra muchos histogramas ya calculados de una sola vez.
+
+    Los histogramas H-S (50x60) de las imágenes candidatas se guardan como filas de una matriz contigua (N, 3000)
+    float32, y las métricas CORREL, CHISQR, INTERSECT y BHATTACHARYYA se calculan con operaciones de numpy sobre la
+    matriz completa en lugar de llamar a cv2.compareHist una vez por imagen. Igual que OpenCV, las sumas se hacen en
+    float64 (por bloques de filas para no duplicar la matriz en memoria), así los valores coinciden con compareHist.
+    """
+
+    def __init__(self, tamanoBloque: int = 2048):
+        """
+        :param tamanoBloque: Filas que se procesan a la vez al comparar.
+        """
+        self.tamanoBloque = tamanoBloque
+        self.imagenes: List[str] = []
+        self._matriz = np.empty((0, 3000), dtype=np.float32)
+        self._cantidad = 0
+
+    def __len__(self) -> int:
+        return self._cantidad
+
+    @property
+    def matriz(self) -> np.ndarray:
+        """
+        Vista (N, 3000) de los histogramas guardados.
+        """
+        return self._matriz[:self._cantidad]
+
+    def agregar(self, path: str, hist: np.ndarray) -> None:
+        """
+        Agrega el histograma ya calculado de una imagen. La matriz crece al doble cuando se llena para que agregar
+        muchas imágenes una por una no copie la matriz en cada paso.
+        """
+        if self._cantidad == len(self._matriz):
+            nueva = np.empty((max(1024, 2 * len(self._matriz)), 3000), dtype=np.float32)
+            nueva[:self._cantidad] = self._matriz[:self._cantidad]
+            self._matriz = nueva
+        self._matriz[self._cantidad] = np.asarray(hist, dtype=np.float32).reshape(-1)
+        self._cantidad += 1
+        self.imagenes.append(path)
+
+    def agregar_imagenes(self, pathsImagenes: Iterable[str]) -> None:
+        """
+        Calcula y agrega el histograma de cada imagen.
+        """
+        for path in pathsImagenes:
+            self.agregar(path, calcular_histograma(path))
+
+    def guardar(self, pathMotor: str) -> None:
+        """
+        Guarda los histogramas y las rutas en un archivo .npz.
+        """
+        np.savez(pathMotor, matriz=self.matriz, imagenes=np.array(self.imagenes, dtype=str))
+
+    @classmethod
+    def cargar(cls, pathMotor: str, tamanoBloque: int = 2048) -> "MotorHistogramas":
+        with np.load(pathMotor, allow_pickle=False) as archivo:
+            motor = cls(tamanoBloque)
+            motor._matriz = np.ascontiguousarray(archivo["matriz"], dtype=np.float32)
+            motor._cantidad = len(motor._matriz)
+            motor.imagenes = [str(path) for path in archivo["imagenes"]]
+        return motor
+
+    def similitudes(self, histOriginal: np.ndarray, metodo: int = cv2.HISTCMP_CORREL) -> np.ndarray:
+        """
+        Calcula la métrica de comparación entre histOriginal y cada histograma guardado, con las mismas fórmulas que
+        cv2.compareHist(histOriginal, hist, metodo).
+        :return: Array float64 de largo N.
+        """
+        h1 = np.asarray(histOriginal, dtype=np.float64).reshape(-1)
+        resultado = np.empty(self._cantidad, dtype=np.float64)
+
+        if metodo == cv2.HISTCMP_CORREL:
+            c1 = h1 - h1.mean()
+            norma1 = np.dot(c1, c1)
+        elif metodo == cv2.HISTCMP_CHISQR:
+            # OpenCV solo suma los bins donde el histograma de referencia no es cero
+            columnas = np.abs(h1) > np.finfo(np.float64).eps
+            h1Columnas = h1[columnas]
+        elif metodo == cv2.HISTCMP_BHATTACHARYYA:
+            raiz1 = np.sqrt(h1)
+            suma1 = h1.sum()
+        elif metodo != cv2.HISTCMP_INTERSECT:
+            raise ValueError(f"Método de comparación no soportado: {metodo}")
+
+        for inicio in range(0, self._cantidad, self.tamanoBloque):
+            bloque = self._matriz[inicio:min(inicio + self.tamanoBloque, self._cantidad)].astype(np.float64)
+            fin = inicio + len(bloque)
+            if metodo == cv2.HISTCMP_CORREL:
+                c2 = bloque - bloque.mean(axis=1, keepdims=True)
+                denominador = np.sqrt(norma1 * np.einsum("ij,ij->i", c2, c2))
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    correlacion = (c2 @ c1) / denominador
+                correlacion[denominador <= np.finfo(np.float64).eps] = 1.0
+                resultado[inicio:fin] = correlacion
+            elif metodo == cv2.HISTCMP_CHISQR:
+                diferencia = bloque[:, columnas] - h1Columnas
+                resultado[inicio:fin] = (diferencia * diferencia / h1Columnas).sum(axis=1)
+            elif metodo == cv2.HISTCMP_INTERSECT:
+                resultado[inicio:fin] = np.minimum(bloque, h1).sum(axis=1)
+            else:
+                producto = suma1 * bloque.sum(axis=1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    escala = 1.0 / np.sqrt(producto)
+                escala[np.abs(producto) <= np.finfo(np.float32).eps] = 1.0
+                resultado[inicio:fin] = np.sqrt(np.maximum(1.0 - (np.sqrt(bloque) @ raiz1) * escala, 0.0))
+        return resultado
+
+    @staticmethod
+    def _son_similares(similitudes: np.ndarray, metodo: int, umbral: float) -> np.ndarray:
+        if metodo in METODOS_MAYOR_ES_MEJOR:
+            return similitudes >= umbral
+        return similitudes <= umbral
+
+    def _resultados(self, indices: np.ndarray, similitudes: np.ndarray, metodo: int, umbral: float) -> List[Dict[str, Union[str, float, bool]]]:
+        similares = self._son_similares(similitudes, metodo, umbral)
+        return [
+            {
+                "imagen": self.imagenes[i],
+                "similitud": round(float(similitudes[i]), 4),
+                "son_similares": bool(similares[i])
+            }
+            for i in indices
+        ]
+
+    def comparar(self, histOriginal: np.ndarray, metodo: int = cv2.HISTCMP_CORREL, umbral: float = 0.8) -> List[Dict[str, Union[str, float, bool]]]:
+        """
+        Compara histOriginal contra todos los histogramas guardados.
+        :return: Lista de diccionarios con los mismos campos que ComparadorImagenes.compare_histogramas, en el orden
+        en que se agregaron las imágenes.
+        """
+        similitudes = self.similitudes(histOriginal, metodo)
+        return self._resultados(np.arange(self._cantidad), similitudes, metodo, umbral)
+
+    def top_k(self, histOriginal: np.ndarray, k: int = 10, metodo: int = cv2.HISTCMP_CORREL, umbral: float = 0.8) -> List[Dict[str, Union[str, float, bool]]]:
+        """
+        Devuelve las k imágenes más parecidas a histOriginal, de la más parecida a la menos parecida.
+        """
+        similitudes = self.similitudes(histOriginal, metodo)
+        k = min(k, self._cantidad)
+        if k <= 0:
+            return []
+        # argpartition selecciona los k mejores sin ordenar toda la lista; después se ordenan solo esos k
+        orden = -similitudes if metodo in METODOS_MAYOR_ES_MEJOR else similitudes
+        mejores = np.argpartition(orden, k - 1)[:k]
+        mejores = mejores[np.argsort(orden[mejores], kind="stable")]
+        return self._resultados(mejores, similitudes, metodo, umbral)
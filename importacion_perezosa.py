@@ -0,0 +1,30 @@
+import importlib
+from typing import Any
+
+
+class ModuloPerezoso:
+    """
+    Módulo que se importa recién la primera vez que se usa uno de sus atributos.
+
+    Importar OpenCV, numpy, PIL e imagehash lleva una buena parte del tiempo de arranque de la interfaz y de las
+    corridas cortas de la línea de comandos, aunque muchas veces solo se use uno de ellos (pHash no necesita OpenCV).
+    Se usa en lugar del import normal, con el mismo nombre:
+        cv2 = ModuloPerezoso("cv2")
+        Image = ModuloPerezoso("PIL.Image")
+    Los módulos que lo usan deben tener `from __future__ import annotations`, para que las anotaciones de tipos
+    (ej: np.ndarray) no se evalúen al definir las funciones. Los valores por defecto de los parámetros sí se evalúan,
+    así que no pueden usar atributos del módulo (ej: cv2.HISTCMP_CORREL).
+    """
+
+    def __init__(self, nombre: str):
+        self.__nombre = nombre
+
+    def __getattr__(self, atributo: str) -> Any:
+        modulo = importlib.import_module(self.__nombre)
+        # Se copian los atributos del módulo a este objeto para que los accesos siguientes sean un acceso normal y no
+        # pasen por __getattr__ (importa en los ciclos por keypoint o por imagen)
+        self.__dict__.update(vars(modulo))
+        return getattr(modulo, atributo)
+
+    def __repr__(self) -> str:
+        return f"<ModuloPerezoso {self.__nombre!r}>"
@@ -0,0 +1,208 @@
+from __future__ import annotations
+import os
+import json
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional, Union
+from importacion_perezosa import ModuloPerezoso
+from phash_lote import phash_imagenes
+
+imagehash = ModuloPerezoso("imagehash")
+Image = ModuloPerezoso("PIL.Image")
+
+
+def hash_a_entero(pHash: imagehash.ImageHash) -> int:
+    """
+    Convierte un ImageHash de 64 bits en un entero, manteniendo el mismo orden de bits que su representación hexadecimal.
+    """
+    return int(str(pHash), 16)
+
+
+def entero_a_hex(valor: int) -> str:
+    """
+    Convierte un hash entero de 64 bits al formato hexadecimal que usa imagehash (16 caracteres).
+    """
+    return f"{valor:016x}"
+
+
+def distancia_hamming(a: int, b: int) -> int:
+    """
+    Número de bits distintos entre dos hashes enteros. Equivale a restar dos ImageHash.
+    """
+    return (a ^ b).bit_count()
+
+
+class IndicePHash:
+    """
+    Índice persistente de pHash basado en un BK-tree (Burkhard-Keller) sobre la distancia de Hamming.
+
+    Cada nodo guarda un hash y sus hijos indexados por la distancia al padre. Por la desigualdad triangular, al buscar
+    todas las imágenes a distancia <= limite de una consulta solo hace falta descender por los hijos cuya distancia al
+    nodo esté en [d - limite, d + limite], lo que evita recorrer todo el archivo cuando el limite es chico.
+    El índice se construye una vez, se puede ampliar incrementalmente con agregar() y se guarda/carga como JSON.
+    """
+
+    def __init__(self):
+        # Cada nodo es [hash, rutas, hijos] donde hijos es {distancia: indice_nodo}
+        self._nodos: List[list] = []
+        self._padres: List[Tuple[int, int]] = []
+        self._rutas: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rutas)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._rutas
+
+    def agregar(self, path: str) -> int:
+        """
+        Calcula el pHash de la imagen y la agrega al índice.
+        :param path: Ruta de la imagen.
+        :return: Hash de la imagen como entero.
+        """
+        with Image.open(path) as imagen:
+            valor = int(phash_imagenes([imagen])[0])
+        self.agregar_hash(path, valor)
+        return valor
+
+    def agregar_hash(self, path: str, valor: int) -> None:
+        """
+        Agrega al índice un hash ya calculado. Si la ruta ya estaba indexada con otro hash (el archivo cambió),
+        se reemplaza la entrada anterior.
+        :param path: Ruta de la imagen.
+        :param valor: pHash como entero de 64 bits.
+        """
+        anterior = self._rutas.get(path)
+        if anterior is not None:
+            if self._nodos[anterior][0] == valor:
+                return
+            # El nodo queda en el árbol aunque se quede sin rutas, porque sigue sirviendo para ordenar a sus hijos
+            self._nodos[anterior][1].remove(path)
+
+        self._rutas[path] = self._insertar(valor, path)
+
+    def _insertar(self, valor: int, path: str) -> int:
+        if not self._nodos:
+            return self._nuevo_nodo(valor, path, -1, 0)
+
+        actual = 0
+        while True:
+            nodo = self._nodos[actual]
+            distancia = distancia_hamming(valor, nodo[0])
+            if distancia == 0:
+                nodo[1].append(path)
+                return actual
+            hijo = nodo[2].get(distancia)
+            if hijo is None:
+                indice = self._nuevo_nodo(valor, path, actual, distancia)
+                nodo[2][distancia] = indice
+                return indice
+            actual = hijo
+
+    def _nuevo_nodo(self, valor: int, path: str, padre: int, distancia: int) -> int:
+        self._nodos.append([valor, [path], {}])
+        self._padres.append((padre, distancia))
+        return len(self._nodos) - 1
+
+    def buscar_hash(self, valor: int, limite: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Busca todas las imágenes cuyo hash está a distancia de Hamming <= limite.
+        :param valor: pHash de consulta como entero.
+        :param limite: Distancia máxima.
+        :return: Lista de tuplas (ruta, distancia, hash) ordenada por distancia.
+        """
+        encontrados = []
+        if not self._nodos:
+            return encontrados
+
+        pendientes = [0]
+        while pendientes:
+            nodo = self._nodos[pendientes.pop()]
+            distancia = distancia_hamming(valor, nodo[0])
+            if distancia <= limite:
+                encontrados.extend((path, distancia, nodo[0]) for path in nodo[1])
+            desde, hasta = distancia - limite, distancia + limite
+            pendientes.extend(hijo for d, hijo in nodo[2].items() if desde <= d <= hasta)
+
+        encontrados.sort(key=lambda x: (x[1], x[0]))
+        return encontrados
+
+    def consultar(self, pathImagen: str, limite: int = 10) -> List[Dict[str, Union[str, int, bool]]]:
+        """
+        Busca en el índice las imágenes similares a pathImagen, con los mismos campos que devuelve
+        ComparadorImagenes.compare_pHash para que se pueda usar en su lugar.
+        :param pathImagen: Ruta de la imagen de consulta (no hace falta que esté indexada).
+        :param limite: Límite de diferencia para considerar dos imágenes similares.
+        :return: Lista de diccionarios con resultados de comparación, ordenada por diferencia.
+        """
+        with Image.open(pathImagen) as imagen:
+            pHashOriginal = int(phash_imagenes([imagen])[0])
+        return self.consultar_hash(pHashOriginal, limite)
+
+    def consultar_hash(self, pHashOriginal: int, limite: int = 10) -> List[Dict[str, Union[str, int, bool]]]:
+        """
+        Igual que consultar() pero a partir de un pHash ya calculado.
+        """
+        resultados = []
+        for path, diferencia, valor in self.buscar_hash(pHashOriginal, limite):
+            fechaMod = None
+            if os.path.exists(path):
+                fechaMod = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+            resultados.append({
+                "imagen": path,
+                "diferencia": diferencia,
+                "hash_original": entero_a_hex(pHashOriginal),
+                "hash_comparada": entero_a_hex(valor),
+                "fecha_modificacion": fechaMod,
+                "son_similares": diferencia <= limite
+            })
+        return resultados
+
+    def guardar(self, pathIndice: str) -> None:
+        """
+        Guarda el índice en disco. Los nodos se escriben en orden de creación junto con su padre y la distancia al
+        padre, así al cargar se reconstruye el árbol en tiempo lineal sin recalcular distancias.
+        El archivo se escribe primero en uno temporal y luego se reemplaza para no dejar índices a medio escribir.
+        """
+        datos = {
+            "version": 1,
+            "nodos": [
+                [entero_a_hex(nodo[0]), padre, distancia, nodo[1]]
+                for nodo, (padre, distancia) in zip(self._nodos, self._padres)
+            ]
+        }
+        temporal = f"{pathIndice}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(datos, archivo, ensure_ascii=False)
+        os.replace(temporal, pathIndice)
+
+    @classmethod
+    def cargar(cls, pathIndice: str) -> "IndicePHash":
+        """
+        Carga un índice guardado con guardar().
+        """
+        with open(pathIndice, "r", encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+
+        indice = cls()
+        for posicion, (valorHex, padre, distancia, rutas) in enumerate(datos["nodos"]):
+            indice._nodos.append([int(valorHex, 16), list(rutas), {}])
+            indice._padres.append((padre, distancia))
+            if padre >= 0:
+                indice._nodos[padre][2][distancia] = posicion
+            for path in rutas:
+                indice._rutas[path] = posicion
+        return indice
+
+    @classmethod
+    def construir(cls, pathsImagenes: List[str], pathIndice: Optional[str] = None) -> "IndicePHash":
+        """
+        Construye un índice a partir de una lista de imágenes y opcionalmente lo guarda.
+        :param pathsImagenes: Rutas de las imágenes a indexar.
+        :param pathIndice: Si se indica, ruta donde se guarda el índice.
+        """
+        indice = cls()
+        for path in pathsImagenes:
+            indice.agregar(path)
+        if pathIndice:
+            indice.guardar(pathIndice)
+        return indice
@@ -0,0 +1,156 @@
+import time
+import bisect
+import contextlib
+from typing import Any, Callable, Dict, List, Optional
+
+# Límites (en milisegundos) de los intervalos del histograma de tiempos de cada etapa
+LIMITES_HISTOGRAMA_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_SIN_MEDICION = contextlib.nullcontext()
+
+
+def sin_medir(etapa: str) -> contextlib.nullcontext:
+    """
+    Reemplazo de Instrumentacion.etapa cuando la instrumentación está desactivada: no mide nada y siempre devuelve el
+    mismo contexto vacío, así el costo es una llamada a función.
+    """
+    return _SIN_MEDICION
+
+
+def _histograma_vacio() -> Dict[str, int]:
+    histograma = {f"<={limite}": 0 for limite in LIMITES_HISTOGRAMA_MS}
+    histograma[f">{LIMITES_HISTOGRAMA_MS[-1]}"] = 0
+    return histograma
+
+
+class Instrumentacion:
+    """
+    Mide cuánto tarda cada etapa (decodificacion, extraccion, comparacion, filtrado, dibujo, escritura) de cada imagen
+    comparada por un ComparadorImagenes.
+
+    Los tiempos de cada imagen se agregan al resultado en "tiempos" (en milisegundos, más "total"), y al terminar cada
+    llamada queda en ultima_llamada un resumen con la cantidad de imágenes y, por etapa, la cantidad de mediciones, el
+    total, el mínimo, el máximo y un histograma con los intervalos de LIMITES_HISTOGRAMA_MS. Las etapas anidadas se
+    descuentan de la etapa que las contiene, así la suma de las etapas nunca supera el total.
+    Si se indica un sumidero, se lo llama con ("imagen", {"imagen", "tiempos"}) por cada imagen y con
+    ("llamada", resumen) al terminar cada llamada, por ejemplo para enviar las métricas a otro sistema.
+    """
+
+    def __init__(self, sumidero: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        :param sumidero: Función (evento, datos) que recibe las métricas a medida que se generan.
+        """
+        self.sumidero = sumidero
+        self.ultima_llamada: Optional[Dict[str, Any]] = None
+        self._tiempos: Optional[Dict[str, float]] = None
+        self._pila: List[List[float]] = []
+        self._llamada: Optional[Dict[str, Any]] = None
+
+    def __getstate__(self):
+        # En los procesos del pool solo se miden las imágenes; el sumidero y el resumen quedan en el proceso principal
+        estado = self.__dict__.copy()
+        estado["sumidero"] = None
+        estado["_llamada"] = None
+        return estado
+
+    @contextlib.contextmanager
+    def etapa(self, nombre: str):
+        """
+        Mide el bloque como la etapa nombre de la imagen actual. Fuera de medir_imagen no registra nada.
+        """
+        if self._tiempos is None:
+            yield
+            return
+        # Cada nivel de la pila guarda el tiempo que ocuparon sus etapas anidadas
+        self._pila.append([0.0])
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            transcurrido = time.perf_counter() - inicio
+            anidadas = self._pila.pop()[0]
+            if self._pila:
+                self._pila[-1][0] += transcurrido
+            self._tiempos[nombre] = self._tiempos.get(nombre, 0.0) + (transcurrido - anidadas) * 1000
+
+    def medir_imagen(self, comparar: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        """
+        Envuelve una función de comparación por imagen para que agregue los tiempos de sus etapas al resultado.
+        """
+        def comparar_medido(path: str, *args, **kwargs) -> Dict[str, Any]:
+            self._tiempos = {}
+            self._pila = []
+            inicio = time.perf_counter()
+            try:
+                resultado = comparar(path, *args, **kwargs)
+            finally:
+                tiempos, self._tiempos = self._tiempos, None
+            tiempos["total"] = (time.perf_counter() - inicio) * 1000
+            resultado["tiempos"] = {etapa: round(ms, 3) for etapa, ms in tiempos.items()}
+            return resultado
+        return comparar_medido
+
+    def iniciar_llamada(self, nombre: str) -> None:
+        self._llamada = {"metodo": nombre, "imagenes": 0, "inicio": time.perf_counter(), "etapas": {}}
+
+    def registrar(self, resultado: Dict[str, Any]) -> None:
+        """
+        Suma los tiempos de un resultado al resumen de la llamada en curso.
+        """
+        tiempos = resultado.get("tiempos")
+        if self._llamada is None or tiempos is None:
+            return
+        self._llamada["imagenes"] += 1
+        for nombre, ms in tiempos.items():
+            etapa = self._llamada["etapas"].get(nombre)
+            if etapa is None:
+                etapa = {"cantidad": 0, "total_ms": 0.0, "min_ms": ms, "max_ms": ms, "histograma": _histograma_vacio()}
+                self._llamada["etapas"][nombre] = etapa
+            etapa["cantidad"] += 1
+            etapa["total_ms"] += ms
+            etapa["min_ms"] = min(etapa["min_ms"], ms)
+            etapa["max_ms"] = max(etapa["max_ms"], ms)
+            indice = bisect.bisect_left(LIMITES_HISTOGRAMA_MS, ms)
+            clave = (f"<={LIMITES_HISTOGRAMA_MS[indice]}" if indice < len(LIMITES_HISTOGRAMA_MS)
+                     else f">{LIMITES_HISTOGRAMA_MS[-1]}")
+            etapa["histograma"][clave] += 1
+        if self.sumidero is not None:
+            self.sumidero("imagen", {"imagen": resultado.get("imagen"), "tiempos": tiempos})
+
+    def terminar_llamada(self) -> Optional[Dict[str, Any]]:
+        """
+        Cierra el resumen de la llamada en curso, lo guarda en ultima_llamada y lo envía al sumidero.
+        """
+        if self._llamada is None:
+            return None
+        llamada, self._llamada = self._llamada, None
+        llamada["segundos"] = round(time.perf_counter() - llamada.pop("inicio"), 4)
+        for etapa in llamada["etapas"].values():
+            etapa["total_ms"] = round(etapa["total_ms"], 3)
+        self.ultima_llamada = llamada
+        if self.sumidero is not None:
+            self.sumidero("llamada", llamada)
+        return llamada
+
+    @staticmethod
+    @contextlib.contextmanager
+    def perfilar(pathSalida: Optional[str] = None, ordenar: str = "cumulative", lineas: int = 0):
+        """
+        Ejecuta el bloque bajo cProfile. Con workers > 1 solo se perfila el proceso principal.
+        :param pathSalida: Si se indica, guarda las estadísticas en ese archivo (se pueden abrir con pstats o snakeviz).
+        :param ordenar: Criterio de orden al imprimir las estadísticas.
+        :param lineas: Si es mayor a 0, imprime esa cantidad de funciones al terminar.
+        """
+        # cProfile y pstats se importan acá porque solo hacen falta al perfilar
+        import cProfile
+        import pstats
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield perfil
+        finally:
+            perfil.disable()
+            if pathSalida:
+                perfil.dump_stats(pathSalida)
+            if lineas:
+                pstats.Stats(perfil).sort_stats(ordenar).print_stats(lineas)
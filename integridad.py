@@ -0,0 +1,120 @@
+import hashlib
+import io
+from importacion_perezosa import ModuloPerezoso
+from ssim_rapido import LADO_ANALISIS_SSIM, ssim_imagenes
+
+Image = ModuloPerezoso("PIL.Image")
+
+
+# Filas que se copian a la vez al hashear los píxeles, para no duplicar en memoria la imagen completa
+FILAS_POR_BLOQUE_HASH = 256
+
+MODOS_HASH = ("pixeles", "archivo", "png")
+
+# Umbrales de SSIM de verificar_integridad: > 0.95 muy similares, > 0.75 similares, el resto diferentes
+UMBRALES_SSIM = (0.75, 0.95)
+
+
+def hash_pixeles(ruta_archivo, algoritmo="sha256"):
+    """
+    Hash del contenido de la imagen ya decodificada y convertida a RGB. Antes de los píxeles se hashea una cabecera
+    con el modo y el tamaño, así dos imágenes con los mismos bytes pero distinta forma no dan el mismo hash, y los
+    metadatos que hash_png conserva al volver a codificar (el perfil ICC y el color transparente), así da
+    "idénticas" en los mismos casos que hash_png sin codificar PNG.
+    """
+    with Image.open(ruta_archivo) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        ancho, alto = img.size
+        perfil = img.info.get("icc_profile") or b""
+        transparencia = img.info.get("transparency")
+        objeto_hash = hashlib.new(algoritmo)
+        objeto_hash.update(f"{img.mode} {ancho}x{alto} {transparencia!r} {len(perfil)}\n".encode("ascii"))
+        objeto_hash.update(perfil)
+        # Se hashea por bloques de filas: cada bloque se copia dos veces (crop y tobytes), pero nunca hay más de un
+        # bloque copiado a la vez en lugar de una copia de la imagen completa
+        for y in range(0, alto, FILAS_POR_BLOQUE_HASH):
+            objeto_hash.update(img.crop((0, y, ancho, min(y + FILAS_POR_BLOQUE_HASH, alto))).tobytes())
+        return objeto_hash.hexdigest()
+
+
+def hash_archivo(ruta_archivo, algoritmo="sha256", tamano_bloque=1024 * 1024):
+    """
+    Hash de los bytes del archivo, leído por bloques sin decodificar la imagen. Es el más rápido, pero dos archivos
+    con los mismos píxeles y distintos metadatos o compresión dan hashes distintos.
+    :param algoritmo: Cualquier algoritmo de hashlib (ej: "sha256", "blake2b").
+    """
+    objeto_hash = hashlib.new(algoritmo)
+    buffer = bytearray(tamano_bloque)
+    vista = memoryview(buffer)
+    with open(ruta_archivo, "rb") as archivo:
+        while True:
+            leidos = archivo.readinto(buffer)
+            if not leidos:
+                break
+            objeto_hash.update(vista[:leidos])
+    return objeto_hash.hexdigest()
+
+
+def hash_png(ruta_archivo):
+    """
+    SHA-256 del contenido de la imagen: se decodifica, se pasa a RGB y se vuelve a codificar como PNG, así dos
+    archivos con los mismos píxeles dan el mismo hash aunque difieran sus metadatos. Es el método original; es
+    mucho más lento que hash_pixeles y da los mismos veredictos.
+    """
+    with Image.open(ruta_archivo) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        buffer_bytes_img = io.BytesIO()
+        img.save(buffer_bytes_img, format='PNG')
+        bytes_img = buffer_bytes_img.getvalue()
+        objeto_hash = hashlib.sha256(bytes_img)
+        return objeto_hash.hexdigest()
+
+
+def calcular_hash_imagen(ruta_archivo, modo="pixeles", algoritmo="sha256"):
+    """
+    Hash de integridad de la imagen.
+    :param modo: "pixeles" (hash_pixeles), "archivo" (hash_archivo) o "png" (hash_png, el método original).
+    :param algoritmo: Algoritmo de hashlib para los modos "pixeles" y "archivo".
+    """
+    if modo == "pixeles":
+        return hash_pixeles(ruta_archivo, algoritmo)
+    if modo == "archivo":
+        return hash_archivo(ruta_archivo, algoritmo)
+    if modo == "png":
+        return hash_png(ruta_archivo)
+    raise ValueError(f"Modo de hash no reconocido: {modo}")
+
+
+def son_identicas(ruta1, ruta2, algoritmo="sha256"):
+    """
+    Indica si las dos imágenes tienen los mismos píxeles. Primero compara los bytes de los archivos (no hace falta
+    decodificar si son copias exactas) y solo si difieren compara los píxeles.
+    """
+    if hash_archivo(ruta1, algoritmo) == hash_archivo(ruta2, algoritmo):
+        return True
+    return hash_pixeles(ruta1, algoritmo) == hash_pixeles(ruta2, algoritmo)
+
+
+def comparar_similitud_visual(ruta1, ruta2, lado_analisis=LADO_ANALISIS_SSIM, umbrales=None):
+    """
+    Índice SSIM entre dos imágenes en escala de grises; la segunda se redimensiona al tamaño de la primera.
+    Ambas se reducen primero para que su lado mayor no supere lado_analisis (None para usar la resolución completa).
+    :param umbrales: Si se indican, el cálculo termina apenas el resultado ya no puede cruzar ninguno de los umbrales
+    (ver ssim_rapido.ssim); el valor devuelto sirve para clasificar pero no es exacto, así que no hay que pasarlos
+    si el índice se muestra o se guarda.
+    """
+    return ssim_imagenes(ruta1, ruta2, lado_analisis, umbrales=umbrales)
+
+
+def clasificar_ssim(score, umbrales=UMBRALES_SSIM):
+    """
+    Veredicto de verificar_integridad para un SSIM: "muy_similar", "similar" o "diferente".
+    """
+    similares, muy_similares = umbrales
+    if score > muy_similares:
+        return "muy_similar"
+    if score > similares:
+        return "similar"
+    return "diferente"
@@ -1,9 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-from PIL import Image, ImageTk
+import queue
+import bisect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from comparacion import ComparadorImagenes
-import sys
+from comparar_lote import ComparadorLote
+from escritor_coincidencias import EscritorCoincidencias
+from importacion_perezosa import ModuloPerezoso
+
+# PIL se importa recién al mostrar la primera imagen, para que la ventana aparezca antes
+Image = ModuloPerezoso("PIL.Image")
+ImageTk = ModuloPerezoso("PIL.ImageTk")
 
 
 class Button(tk.Canvas):
@@ -63,6 +73,97 @@ class Frame(tk.Frame):
         self.border_color = border_color
         self.corner_radius = corner_radius
 
+# Columnas de la tabla de "comparar todas" para cada algoritmo: (clave del resultado, título)
+COLUMNAS_TABLA = {
+    "ORB": [("imagen", "Imagen"), ("coincidencias_buenas", "Coincidencias buenas"),
+            ("porcentaje_buenas", "% buenas"), ("coincidencias", "Coincidencias")],
+    "pHash": [("imagen", "Imagen"), ("diferencia", "Diferencia"), ("son_similares", "Similares")],
+    "Histograma": [("imagen", "Imagen"), ("similitud", "Similitud"), ("son_similares", "Similares")],
+}
+
+# Orden inicial de la tabla (columna, descendente): las más parecidas primero
+ORDEN_TABLA = {
+    "ORB": ("coincidencias_buenas", True),
+    "pHash": ("diferencia", False),
+    "Histograma": ("similitud", True),
+}
+
+
+class CacheMiniaturas:
+    """
+    Cache LRU de miniaturas ya decodificadas (PIL.Image) con precarga en segundo plano.
+    Las miniaturas se guardan como PIL.Image y no como ImageTk.PhotoImage porque estas solo se pueden crear en el
+    hilo de Tk; convertir una miniatura ya reducida es mucho más barato que decodificar la imagen completa.
+    """
+
+    def __init__(self, capacidad=64, hilos=1):
+        self.capacidad = capacidad
+        self._miniaturas = OrderedDict()
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hilos)
+
+    @staticmethod
+    def _clave(image_path, tamano):
+        # Si el archivo cambia en disco su miniatura anterior deja de usarse
+        estado = os.stat(image_path)
+        return (os.path.abspath(image_path), estado.st_mtime_ns, estado.st_size, tamano)
+
+    @staticmethod
+    def _cargar(image_path, tamano):
+        with Image.open(image_path) as img:
+            # draft hace que el JPEG se decodifique directamente a 1/2, 1/4 u 1/8 del tamaño
+            img.draft("RGB", tamano)
+            # Convertir a RGB si es necesario
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGB')
+            img.thumbnail(tamano, Image.Resampling.LANCZOS)
+            img.load()
+            return img
+
+    def _guardar(self, clave, miniatura):
+        with self._lock:
+            self._pendientes.pop(clave, None)
+            self._miniaturas[clave] = miniatura
+            self._miniaturas.move_to_end(clave)
+            while len(self._miniaturas) > self.capacidad:
+                self._miniaturas.popitem(last=False)
+
+    def obtener(self, image_path, tamano):
+        """Devuelve la miniatura de la imagen, esperando la precarga si ya está en curso"""
+        clave = self._clave(image_path, tamano)
+        with self._lock:
+            if clave in self._miniaturas:
+                self._miniaturas.move_to_end(clave)
+                return self._miniaturas[clave]
+            pendiente = self._pendientes.get(clave)
+        miniatura = pendiente.result() if pendiente is not None else self._cargar(image_path, tamano)
+        self._guardar(clave, miniatura)
+        return miniatura
+
+    def _precargar_una(self, clave, image_path, tamano):
+        try:
+            miniatura = self._cargar(image_path, tamano)
+        except Exception:
+            with self._lock:
+                self._pendientes.pop(clave, None)
+            raise
+        self._guardar(clave, miniatura)
+        return miniatura
+
+    def precargar(self, image_paths, tamano):
+        """Decodifica en segundo plano las miniaturas que todavía no están en la cache"""
+        for image_path in image_paths:
+            try:
+                clave = self._clave(image_path, tamano)
+            except OSError:
+                continue
+            with self._lock:
+                if clave in self._miniaturas or clave in self._pendientes:
+                    continue
+                self._pendientes[clave] = self._executor.submit(self._precargar_una, clave, image_path, tamano)
+
+
 class ImageHashComparator:
     def __init__(self):
         self.root = tk.Tk()
@@ -89,6 +190,28 @@ class ImageHashComparator:
         self.current_compare_index = 0
         self.original_photo = None
         self.compare_photo = None
+        self.vista_previa = None
+        self.path_output = None
+
+        # Las coincidencias ORB se guardan en segundo plano y la vista previa llega en memoria con el resultado
+        self.escritor = EscritorCoincidencias(tamanoVistaPrevia=(500, 300))
+
+        # Las comparaciones corren en un hilo aparte y le pasan los resultados a la interfaz por esta cola
+        self.cola_comparacion = queue.Queue()
+        self.cancelar_comparacion = None
+        self.comparador_en_curso = None
+        self.algoritmo_en_curso = None
+        self.resultados_comparacion = []
+        self.comparando_todas = False
+
+        # Tabla de resultados de "comparar todas"
+        self.tabla_resultados = None
+        self.tabla_estado_label = None
+        self._filas_tabla = {}
+        self._claves_tabla = []
+        self._orden_tabla = None
+
+        self.miniaturas = CacheMiniaturas()
         
         # Referencias a los widgets de imagen
         self.original_image_label = None
@@ -159,11 +282,33 @@ class ImageHashComparator:
                                    bg_color="#99AAB5", hover_color="#7289DA", width=80, height=35)
         self.next_btn.pack(side="left", padx=5)
         
-        # Compare button
-        compare_btn = Button(bottom_frame, "COMPARAR", self.comparar_imagenes_hash,
-                                 bg_color="#43B581", hover_color="#3CA374", 
+        # Compare buttons
+        self.compare_frame = tk.Frame(bottom_frame, bg="#2C2F33")
+        self.compare_frame.pack()
+
+        compare_btn = Button(self.compare_frame, "COMPARAR", self.comparar_imagenes_hash,
+                                 bg_color="#43B581", hover_color="#3CA374",
                                  width=200, height=50, corner_radius=10)
-        compare_btn.pack()
+        compare_btn.pack(side="left", padx=5)
+
+        compare_all_btn = Button(self.compare_frame, "COMPARAR TODAS", self.comparar_todas,
+                                     bg_color="#7289DA", hover_color="#5B6EAE",
+                                     width=200, height=50, corner_radius=10)
+        compare_all_btn.pack(side="left", padx=5)
+        
+        # Progress frame (solo visible mientras se compara)
+        self.progress_frame = tk.Frame(bottom_frame, bg="#2C2F33")
+        
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode="determinate", length=300)
+        self.progress_bar.pack(side="left", padx=5)
+        
+        self.progress_label = tk.Label(self.progress_frame, text="", 
+                                      font=("Segoe UI", 10), bg="#2C2F33", fg="#FFFFFF")
+        self.progress_label.pack(side="left", padx=10)
+        
+        self.cancel_btn = Button(self.progress_frame, "Cancelar", self.cancelar,
+                                     bg_color="#F04747", hover_color="#D84040", width=90, height=35)
+        self.cancel_btn.pack(side="left", padx=5)
         
         self.update_navigation()
         
@@ -230,14 +375,7 @@ class ImageHashComparator:
     def resize_image(self, image_path, max_width=500, max_height=400):
         """Redimensiona una imagen manteniendo la proporción"""
         try:
-            with Image.open(image_path) as img:
-                # Convertir a RGB si es necesario
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Calcular el nuevo tamaño manteniendo la proporción
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                return ImageTk.PhotoImage(img)
+            return ImageTk.PhotoImage(self.miniaturas.obtener(image_path, (max_width, max_height)))
         except Exception as e:
             print(f"Error al redimensionar imagen: {e}")
             return None
@@ -288,6 +426,11 @@ class ImageHashComparator:
             else:
                 self.compare_image_label.configure(text="Error al cargar imagen")
                 self.compare_info_label.configure(text="")
+            
+            # Precargar las imágenes vecinas para que navegar no tenga que esperar la decodificación
+            vecinas = [self.compare_images[i] for i in (self.current_compare_index + 1, self.current_compare_index - 1)
+                       if 0 <= i < len(self.compare_images)]
+            self.miniaturas.precargar(vecinas, (500, 400))
         else:
             self.compare_image_label.configure(image="", text="Click para cargar imagen(es)")
             self.compare_info_label.configure(text="")
@@ -340,7 +483,8 @@ class ImageHashComparator:
 
         for idx, resultado in enumerate(resultados, 1):
             imagen = resultado.get('imagen', 'Desconocida')
-            texto += f"🖼️ Imagen {self.current_compare_index +1}:\n"
+            posicion = self.compare_images.index(imagen) + 1 if imagen in self.compare_images else idx
+            texto += f"🖼️ Imagen {posicion}:\n"
             texto += f"   📍 Ruta: {imagen}\n"
 
             # Detectar tipo de resultado: pHash, ORB o Histograma
@@ -364,6 +508,7 @@ class ImageHashComparator:
                 porcentaje_buenas = resultado.get('porcentaje_buenas', 'N/A')
                 path_output = resultado.get('pathOutput', 'No disponible')
                 self.path_output = path_output
+                self.vista_previa = resultado.get('vista_previa')
 
                 texto += f"   🔍 Coincidencias ORB: {coincidencias} totales, {buenas} buenas / {min(kp1, kp2)} puntos clave\n"
                 texto += f"   🎯 Porcentaje coincidencias: {porcentaje}, Buenas: {porcentaje_buenas}\n"
@@ -385,6 +530,8 @@ class ImageHashComparator:
         return texto
 
     def comparar_imagenes_hash(self):
+        if self.cancelar_comparacion is not None:
+            return  # Ya hay una comparación en curso
         if not self.original_image:
             messagebox.showerror("Error", "¡Primero cargue una imagen original!")
             return
@@ -392,125 +539,239 @@ class ImageHashComparator:
             messagebox.showerror("Error", "¡Cargue imágenes para comparar!")
             return
     
-        # Disable all widgets and set wait cursor
-        self._set_procesamiento(True)
-        # Programar la comparación para ejecutarse después de un breve retraso
-        self.root.after(100, self._comparar_after)
-        
-    def _comparar_after(self):
-        try:
-            algorithm = self.algorithm_var.get()
-            comparator = ComparadorImagenes(self.original_image)
-            current_image = self.compare_images[self.current_compare_index]
-            
-            if algorithm == "ORB":
-                results = comparator.compare_ORB([current_image], saveOutput=True)
-            elif algorithm == "pHash":
-                results = comparator.compare_pHash([current_image])
-            elif algorithm == "Histograma":
-                results = comparator.compare_histogramas([current_image])
-            else:
-                raise ValueError("Algoritmo no reconocido")
-            
-            # Pasar los resultados directamente
-            self.root.after(0, self._mostrar_resultados_reinicia_cursor, results)
-        except Exception as e:
-            # Pasar el mensaje de error directamente
-            self.root.after(0, self._manejar_error_reinicia_cursor, str(e))
-
-    def _set_procesamiento(self, processing):
-        """Gestiona el estado de procesamiento (cursor, estado de widgets)"""
-        if processing:
-            # 1. Guardar cursores originales
-            self._original_cursors = {}
-            self._guardar_cursores(self.root)
-            
-            # 2. Deshabilitar todos los widgets (excepto la ventana principal)
-            self._deshabilitar_widgets(self.root)
-            
-            # 3. Cambiar cursor a "wait"
-            if sys.platform.startswith('win'):
-                self._set_cursores_recursivo(self.root, "wait")
-                self.root.config(cursor="wait")
-            elif sys.platform.startswith('linux'):
-                self._set_cursores_recursivo(self.root, "watch")
-                self.root.config(cursor="watch")
-        else:
-            # 1. Habilitar todos los widgets
-            self._habilitar_widgets(self.root)
-            
-            # 2. Restaurar cursores originales
-            self._restablecer_cursores(self.root)
-            self.root.config(cursor="")
+        self.iniciar_comparacion([self.compare_images[self.current_compare_index]])
 
-    def _guardar_cursores(self, widget):
-        """Guarda los cursores originales de todos los widgets"""
-        try:
-            self._original_cursors[widget] = widget.cget("cursor")
-        except:
-            pass
-        
-        for child in widget.winfo_children():
-            self._guardar_cursores(child)
-
-    def _restablecer_cursores(self, widget):
-        """Restaura los cursores originales"""
-        if widget in self._original_cursors:
-            try:
-                widget.config(cursor=self._original_cursors[widget])
-            except:
-                pass
-        
-        for child in widget.winfo_children():
-            self._restablecer_cursores(child)
+    def comparar_todas(self):
+        """Compara todas las imágenes cargadas en paralelo y muestra los resultados en una tabla a medida que llegan"""
+        if self.cancelar_comparacion is not None:
+            return  # Ya hay una comparación en curso
+        if not self.original_image:
+            messagebox.showerror("Error", "¡Primero cargue una imagen original!")
+            return
+        if not self.compare_images:
+            messagebox.showerror("Error", "¡Cargue imágenes para comparar!")
+            return
 
-    def _set_cursores_recursivo(self, widget, cursor):
-        """Establece un cursor recursivamente en todos los widgets"""
+        self.abrir_tabla_resultados(self.algorithm_var.get())
+        self.iniciar_comparacion(self.compare_images, todas=True)
+
+    def iniciar_comparacion(self, paths, todas=False):
+        """Lanza la comparación de paths en un hilo aparte; los resultados llegan por cola_comparacion"""
+        self.cancelar_comparacion = threading.Event()
+        self.resultados_comparacion = []
+        self.comparando_todas = todas
+        # El combo de algoritmo sigue habilitado durante la comparación: los resultados se muestran según el algoritmo
+        # con el que se lanzó, no el que esté elegido al terminar
+        self.algoritmo_en_curso = self.algorithm_var.get()
+        self.vista_previa = None
+        self.path_output = None
+        self.progress_bar.configure(maximum=len(paths), value=0)
+        self.progress_label.configure(text=f"Comparando 0 de {len(paths)}")
+        self.compare_frame.pack_forget()
+        self.progress_frame.pack()
+
+        # Con todas las imágenes se usa un proceso por núcleo y los resultados llegan en el orden en que terminan
+        workers = os.cpu_count() if todas else None
+        # El comparador se crea acá para que cancelar() pueda terminar sus procesos desde el hilo de Tk
+        self.comparador_en_curso = self._crear_comparador(self.original_image, todas)
+        hilo = threading.Thread(target=self._comparar_en_hilo,
+                                args=(self.comparador_en_curso, self.algoritmo_en_curso, list(paths),
+                                      self.cancelar_comparacion, workers, todas),
+                                daemon=True)
+        hilo.start()
+        self.root.after(50, self._procesar_cola_comparacion)
+
+    def _crear_comparador(self, original, todas=False):
+        if todas:
+            # La tabla no muestra las imágenes de coincidencias ORB, así que no se dibujan ni se guardan; un archivo
+            # que no se puede leer queda como una fila con error en lugar de cortar la comparación
+            return ComparadorLote(original)
+        return ComparadorImagenes(original, escritor=self.escritor)
+
+    def _iterar_comparacion(self, comparator, algorithm, paths, workers=None, todas=False):
+        if algorithm == "ORB":
+            return comparator.iter_compare_ORB(paths, saveOutput=not todas, workers=workers, ordenado=False)
+        elif algorithm == "pHash":
+            return comparator.iter_compare_pHash(paths, workers=workers, ordenado=False)
+        elif algorithm == "Histograma":
+            return comparator.iter_compare_histogramas(paths, workers=workers, ordenado=False)
+        raise ValueError("Algoritmo no reconocido")
+
+    def _comparar_en_hilo(self, comparator, algorithm, paths, cancelar, workers=None, todas=False):
+        """Corre en el hilo de comparación: no debe tocar widgets, solo encolar mensajes"""
         try:
-            widget.config(cursor=cursor)
-        except:
-            pass
-        
-        for child in widget.winfo_children():
-            self._set_cursores_recursivo(child, cursor)
-
-    def _deshabilitar_widgets(self, parent):
-        """Deshabilita recursivamente todos los widgets hijos"""
-        for child in parent.winfo_children():
+            resultados = self._iterar_comparacion(comparator, algorithm, paths, workers, todas)
             try:
-                # Solo deshabilitar widgets que soporten state
-                if 'state' in child.keys():
-                    child.config(state='disabled')
-            except Exception as e:
-                print(f"No se pudo deshabilitar widget: {e}")
-            
-            # Procesar hijos recursivamente
-            if hasattr(child, 'winfo_children'):
-                self._deshabilitar_widgets(child)
+                for resultado in resultados:
+                    if cancelar.is_set():
+                        break
+                    self.cola_comparacion.put((cancelar, "resultado", resultado))
+            finally:
+                # Cerrar el generador descarta las imágenes que no empezaron y termina los procesos sin esperar
+                resultados.close()
+            self.cola_comparacion.put((cancelar, "fin", None))
+        except Exception as e:
+            self.cola_comparacion.put((cancelar, "error", str(e)))
 
-    def _habilitar_widgets(self, parent):
-        """Habilita recursivamente todos los widgets hijos"""
-        for child in parent.winfo_children():
+    def _procesar_cola_comparacion(self):
+        """Corre en el hilo de Tk: vacía la cola y actualiza el progreso"""
+        while True:
             try:
-                # Solo habilitar widgets que soporten state
-                if 'state' in child.keys():
-                    child.config(state='normal')
-            except Exception as e:
-                print(f"No se pudo habilitar widget: {e}")
-            
-            # Procesar hijos recursivamente
-            if hasattr(child, 'winfo_children'):
-                self._habilitar_widgets(child)
-
-    def _mostrar_resultados_reinicia_cursor(self, results):
-        self.show_results_window(self.format_results(results))
-        self._set_procesamiento(False)
+                cancelar, tipo, dato = self.cola_comparacion.get_nowait()
+            except queue.Empty:
+                break
+            if cancelar is not self.cancelar_comparacion or cancelar.is_set():
+                continue  # Mensaje de una comparación cancelada
+            if tipo == "resultado":
+                self.resultados_comparacion.append(dato)
+                self.progress_bar.configure(value=len(self.resultados_comparacion))
+                self.progress_label.configure(
+                    text=f"Comparando {len(self.resultados_comparacion)} de {int(self.progress_bar['maximum'])}")
+                if self.comparando_todas:
+                    self.agregar_fila_tabla(dato)
+            elif tipo == "fin":
+                self._terminar_comparacion()
+                if self.comparando_todas:
+                    errores = sum(1 for resultado in self.resultados_comparacion if "error" in resultado)
+                    texto = f"Listo: {len(self.resultados_comparacion)} imágenes comparadas"
+                    if errores:
+                        texto += f" ({errores} no se pudieron leer)"
+                    self._actualizar_estado_tabla(texto)
+                else:
+                    self.show_results_window(self.format_results(self.resultados_comparacion), self.algoritmo_en_curso)
+                return
+            else:
+                self._terminar_comparacion()
+                messagebox.showerror("Error", f"Ocurrió un error al comparar: {dato}")
+                return
+        if self.cancelar_comparacion is not None:
+            self.root.after(50, self._procesar_cola_comparacion)
 
-    def _manejar_error_reinicia_cursor(self, error_msg):
-        messagebox.showerror("Error", f"Ocurrió un error al comparar: {error_msg}")
-        self._set_procesamiento(False)
+    def cancelar(self):
+        """
+        Detiene la comparación en curso sin esperarla: con procesos (comparar todas) se terminan también las
+        imágenes que se estaban comparando; una comparación en el hilo termina en segundo plano y se descarta.
+        """
+        if self.cancelar_comparacion is not None:
+            self.cancelar_comparacion.set()
+            self.comparador_en_curso.cancelar()
+            self._terminar_comparacion()
+            if self.comparando_todas:
+                self._actualizar_estado_tabla(f"Cancelado: {len(self.resultados_comparacion)} imágenes comparadas")
+
+    def _terminar_comparacion(self):
+        self.cancelar_comparacion = None
+        self.comparador_en_curso = None
+        self.progress_frame.pack_forget()
+        self.compare_frame.pack()
+
+    def abrir_tabla_resultados(self, algorithm):
+        """Abre (o reinicia) la ventana con la tabla de resultados de "comparar todas" """
+        if self.tabla_resultados is None or not self.tabla_resultados.winfo_exists():
+            ventana = tk.Toplevel(self.root)
+            ventana.title("Resultados de comparación")
+            ventana.geometry("800x600")
+            ventana.configure(bg="#2C2F33")
+
+            self.tabla_estado_label = tk.Label(ventana, text="", font=("Segoe UI", 10),
+                                               bg="#2C2F33", fg="#FFFFFF")
+            self.tabla_estado_label.pack(fill="x", padx=20, pady=(10, 0))
+
+            tabla_frame = tk.Frame(ventana, bg="#2C2F33")
+            tabla_frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+            self.tabla_resultados = ttk.Treeview(tabla_frame, show="headings", selectmode="browse")
+            scrollbar = ttk.Scrollbar(tabla_frame, orient="vertical", command=self.tabla_resultados.yview)
+            self.tabla_resultados.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side="right", fill="y")
+            self.tabla_resultados.pack(side="left", fill="both", expand=True)
+
+            # Doble click en una fila muestra esa imagen en el panel de comparación
+            self.tabla_resultados.bind("<Double-1>", self._seleccionar_fila_tabla)
+
+        columnas = COLUMNAS_TABLA[algorithm]
+        self.tabla_resultados.delete(*self.tabla_resultados.get_children())
+        self.tabla_resultados.configure(columns=[clave for clave, _ in columnas])
+        for clave, titulo in columnas:
+            self.tabla_resultados.heading(clave, text=titulo, command=lambda c=clave: self.ordenar_tabla(c))
+            self.tabla_resultados.column(clave, width=300 if clave == "imagen" else 120,
+                                         anchor="w" if clave == "imagen" else "center")
+        self._filas_tabla = {}
+        self._claves_tabla = []
+        self._orden_tabla = ORDEN_TABLA[algorithm]
+        self._actualizar_estado_tabla("Comparando...")
+
+    def _actualizar_estado_tabla(self, texto):
+        if self.tabla_estado_label is not None and self.tabla_estado_label.winfo_exists():
+            self.tabla_estado_label.configure(text=texto)
+
+    @staticmethod
+    def _valor_orden(resultado, clave, descendente=False):
+        valor = resultado.get(clave)
+        if clave == "imagen":
+            return os.path.basename(valor).lower()
+        if "error" in resultado:
+            # Las filas con error quedan al final en cualquier orden
+            return float("-inf") if descendente else float("inf")
+        if isinstance(valor, str) and valor.endswith("%"):
+            return float(valor[:-1])
+        if isinstance(valor, bool):
+            return int(valor)
+        return valor if valor is not None else 0
+
+    @staticmethod
+    def _valor_celda(resultado, clave, primera=False):
+        valor = resultado.get(clave)
+        if clave == "imagen":
+            return os.path.basename(valor)
+        if "error" in resultado:
+            # El mensaje va en la primera columna de datos y el resto queda vacío
+            return f"Error: {resultado['error']}" if primera else ""
+        if isinstance(valor, bool):
+            return "Sí" if valor else "No"
+        return valor
+
+    def agregar_fila_tabla(self, resultado):
+        """Inserta el resultado en la posición que le corresponde según el orden actual de la tabla"""
+        if self.tabla_resultados is None or not self.tabla_resultados.winfo_exists():
+            return
+        columna, descendente = self._orden_tabla
+        # El contador desempata filas con el mismo valor para no comparar los diccionarios
+        clave = (self._valor_orden(resultado, columna, descendente), len(self._filas_tabla))
+        posicion = bisect.bisect_right(self._claves_tabla, clave)
+        self._claves_tabla.insert(posicion, clave)
+        if descendente:
+            posicion = len(self._claves_tabla) - 1 - posicion
+
+        columnas = self.tabla_resultados["columns"]
+        iid = self.tabla_resultados.insert("", posicion,
+                                           values=[self._valor_celda(resultado, c, i == 1)
+                                                   for i, c in enumerate(columnas)])
+        self._filas_tabla[iid] = resultado
+
+    def ordenar_tabla(self, columna):
+        """Ordena la tabla por la columna (un segundo click invierte el orden)"""
+        actual, descendente = self._orden_tabla
+        descendente = not descendente if columna == actual else False
+        self._orden_tabla = (columna, descendente)
+
+        filas = sorted(self._filas_tabla.items(), key=lambda fila: self._valor_orden(fila[1], columna, descendente))
+        self._claves_tabla = [(self._valor_orden(resultado, columna, descendente), i)
+                              for i, (_, resultado) in enumerate(filas)]
+        if descendente:
+            filas.reverse()
+        for posicion, (iid, _) in enumerate(filas):
+            self.tabla_resultados.move(iid, "", posicion)
+
+    def _seleccionar_fila_tabla(self, event):
+        iid = self.tabla_resultados.focus()
+        resultado = self._filas_tabla.get(iid)
+        if resultado and resultado["imagen"] in self.compare_images:
+            self.current_compare_index = self.compare_images.index(resultado["imagen"])
+            self.update_compare_image_display()
+            self.update_navigation()
     
-    def show_results_window(self, results_text):
+    def show_results_window(self, results_text, algorithm):
         results_window = tk.Toplevel(self.root)
         results_window.title("Resultados de comparación")
         results_window.geometry("600x600")  # Aumenta la altura para mostrar la imagen
@@ -527,15 +788,17 @@ class ImageHashComparator:
 
         text_widget.insert("1.0", results_text)
         text_widget.configure(state="disabled")
-        algorithm = self.algorithm_var.get()
 
 
-        if algorithm == "ORB":
+        if algorithm == "ORB" and (self.vista_previa is not None or self.path_output):
             image_frame = tk.Frame(results_window, bg="#2C2F33")
             image_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
-            img = Image.open(self.path_output)
-            img = img.resize((500, 300), Image.LANCZOS)  # Redimensiona para encajar en la ventana
+            if self.vista_previa is not None:
+                img = Image.fromarray(self.vista_previa)  # Ya viene en el tamaño de la ventana
+            else:
+                img = Image.open(self.path_output)
+                img = img.resize((500, 300), Image.LANCZOS)  # Redimensiona para encajar en la ventana
             img_tk = ImageTk.PhotoImage(img)
 
             img_label = tk.Label(image_frame, image=img_tk, bg="#2C2F33")
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from comparacion import calcular_pHash, listar_imagenes
+from indice_phash import distancia_hamming
+from integridad import calcular_hash_imagen, clasificar_ssim, comparar_similitud_visual
+
+VERSION_MANIFIESTO = 1
+
+# Si no hay copia de referencia para calcular el SSIM, el veredicto sale de la diferencia de pHash:
+# <= 4 muy similar, <= 10 similar (el limite por defecto de compare_pHash), más es diferente
+UMBRALES_PHASH = (4, 10)
+
+
+def _ruta_relativa(raiz: str, ruta: str) -> str:
+    # Las rutas del manifiesto usan "/" para que sea el mismo en Windows y en Linux
+    return os.path.relpath(ruta, raiz).replace(os.sep, "/")
+
+
+def _entrada_archivo(argumentos: Tuple[str, str]) -> Dict[str, object]:
+    """
+    Calcula la entrada del manifiesto de un archivo: tamaño, fecha de modificación, hash de los píxeles y pHash.
+    Los errores se devuelven en la entrada para que un archivo dañado no detenga todo el lote.
+    """
+    ruta, algoritmo = argumentos
+    entrada = {}
+    try:
+        # Dentro del try: el archivo puede haberse borrado después de recorrer el directorio
+        estado = os.stat(ruta)
+        entrada["tamano"] = estado.st_size
+        entrada["mtime_ns"] = estado.st_mtime_ns
+        entrada["hash"] = calcular_hash_imagen(ruta, "pixeles", algoritmo)
+        entrada["phash"] = str(calcular_pHash(ruta))
+    except Exception as e:
+        entrada["error"] = str(e)
+    return entrada
+
+
+def _sin_cambios(entrada: Dict[str, object], ruta: str) -> bool:
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        # Se borró después de recorrer el directorio: al leerlo queda como error
+        return False
+    return entrada.get("tamano") == estado.st_size and entrada.get("mtime_ns") == estado.st_mtime_ns
+
+
+def _mapear(funcion, argumentos: List, workers: Optional[int]) -> Iterator:
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(funcion, argumentos, chunksize=16)
+    else:
+        yield from map(funcion, argumentos)
+
+
+def construir_manifiesto(directorio: str, workers: Optional[int] = None, algoritmo: str = "sha256",
+                         anterior: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """
+    Recorre el directorio y registra, para cada imagen, el hash de sus píxeles (calcular_hash_imagen) y su pHash.
+    :param workers: Si es mayor a 1, número de procesos para calcular los hashes en paralelo.
+    :param algoritmo: Algoritmo de hashlib para el hash de los píxeles.
+    :param anterior: Manifiesto anterior del mismo directorio: las entradas de los archivos con el mismo tamaño y
+    fecha de modificación se copian sin volver a leer la imagen.
+    :return: Diccionario con "version", "raiz", "algoritmo", "creado" y "archivos" (ruta relativa -> entrada).
+    """
+    raiz = os.path.abspath(directorio)
+    anteriores = {}
+    if anterior is not None and anterior.get("algoritmo") == algoritmo:
+        anteriores = anterior["archivos"]
+
+    archivos = {}
+    pendientes = []
+    for ruta in listar_imagenes(raiz):
+        relativa = _ruta_relativa(raiz, ruta)
+        entrada = anteriores.get(relativa)
+        if entrada is not None and "error" not in entrada and _sin_cambios(entrada, ruta):
+            archivos[relativa] = entrada
+        else:
+            pendientes.append((relativa, ruta))
+
+    calculadas = _mapear(_entrada_archivo, [(ruta, algoritmo) for _, ruta in pendientes], workers)
+    for (relativa, ruta), entrada in zip(pendientes, calculadas):
+        if "error" in entrada:
+            print(f"No se pudo procesar {ruta}: {entrada['error']}", file=sys.stderr)
+        archivos[relativa] = entrada
+
+    return {
+        "version": VERSION_MANIFIESTO,
+        "raiz": raiz,
+        "algoritmo": algoritmo,
+        "creado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "archivos": dict(sorted(archivos.items())),
+    }
+
+
+def guardar_manifiesto(manifiesto: Dict[str, object], pathManifiesto: str) -> None:
+    # Se escribe a un archivo temporal y se renombra para no dejar un manifiesto a medio escribir
+    temporal = f"{pathManifiesto}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1)
+    os.replace(temporal, pathManifiesto)
+
+
+def cargar_manifiesto(pathManifiesto: str) -> Dict[str, object]:
+    with open(pathManifiesto, encoding="utf-8") as archivo:
+        manifiesto = json.load(archivo)
+    if manifiesto.get("version") != VERSION_MANIFIESTO:
+        raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}")
+    return manifiesto
+
+
+def clasificar_phash(diferencia: int, umbrales: Tuple[int, int] = UMBRALES_PHASH) -> str:
+    muy_similares, similares = umbrales
+    if diferencia <= muy_similares:
+        return "muy_similar"
+    if diferencia <= similares:
+        return "similar"
+    return "diferente"
+
+
+def _verificar_archivo(argumentos: Tuple[str, Dict[str, object], str, Optional[str]]) -> Dict[str, object]:
+    """
+    Compara un archivo con su entrada del manifiesto. Si los píxeles cambiaron, gradúa la diferencia con SSIM contra
+    la copia de referencia (si existe) o, si no, con la diferencia de pHash.
+    """
+    ruta, entrada, algoritmo, referencia = argumentos
+    resultado = {}
+    try:
+        if calcular_hash_imagen(ruta, "pixeles", algoritmo) == entrada["hash"]:
+            resultado["estado"] = "identica"
+            return resultado
+        if referencia is not None:
+            # Sin umbrales: el índice se guarda en el resultado, así que tiene que ser el exacto
+            score = comparar_similitud_visual(referencia, ruta)
+            resultado["ssim"] = round(float(score), 4)
+            resultado["estado"] = clasificar_ssim(score)
+        else:
+            diferencia = distancia_hamming(int(entrada["phash"], 16), int(str(calcular_pHash(ruta)), 16))
+            resultado["diferencia_phash"] = diferencia
+            resultado["estado"] = clasificar_phash(diferencia)
+    except Exception as e:
+        resultado["estado"] = "error"
+        resultado["error"] = str(e)
+    return resultado
+
+
+def verificar_manifiesto(directorio: str, manifiesto: Dict[str, object], workers: Optional[int] = None,
+                         referencia: Optional[str] = None, completo: bool = False) -> Iterator[Dict[str, object]]:
+    """
+    Verifica un directorio contra un manifiesto y devuelve un resultado por archivo, en orden de ruta.
+
+    Cada resultado tiene "ruta" (relativa) y "estado":
+        - "sin_cambios": mismo tamaño y fecha de modificación que en el manifiesto (no se lee la imagen).
+        - "identica": el archivo cambió pero sus píxeles no.
+        - "muy_similar", "similar", "diferente": los píxeles cambiaron; el grado sale del SSIM contra la copia de
+          referencia ("ssim") con los umbrales de verificar_integridad o, sin copia, de la diferencia de pHash
+          ("diferencia_phash").
+        - "faltante": está en el manifiesto pero no en el directorio.
+        - "nueva": está en el directorio pero no en el manifiesto.
+        - "error": no se pudo leer ahora o no se pudo leer al construir el manifiesto, así que no hay contra qué
+          compararlo ("error" tiene el mensaje).
+    :param workers: Si es mayor a 1, número de procesos para verificar en paralelo.
+    :param referencia: Directorio con las imágenes originales para el SSIM. Por defecto la raíz del manifiesto,
+    salvo que sea el mismo directorio que se verifica (en ese caso los originales ya no existen).
+    :param completo: Si es True se verifican también los archivos sin cambios de tamaño ni fecha (para detectar
+    daños silenciosos en el disco).
+    """
+    raiz = os.path.abspath(directorio)
+    if referencia is None and os.path.abspath(manifiesto["raiz"]) != raiz:
+        referencia = manifiesto["raiz"]
+    algoritmo = manifiesto["algoritmo"]
+    entradas = manifiesto["archivos"]
+
+    presentes = {_ruta_relativa(raiz, ruta): ruta for ruta in listar_imagenes(raiz)}
+    resultados = {}
+    pendientes = []
+    for relativa in sorted(set(entradas) | set(presentes)):
+        entrada = entradas.get(relativa)
+        ruta = presentes.get(relativa)
+        if ruta is None:
+            resultados[relativa] = {"ruta": relativa, "estado": "faltante"}
+        elif entrada is None:
+            resultados[relativa] = {"ruta": relativa, "estado": "nueva"}
+        elif "hash" not in entrada:
+            resultados[relativa] = {"ruta": relativa, "estado": "error",
+                                    "error": f"Sin hash en el manifiesto: {entrada.get('error', 'no se pudo leer')}"}
+        elif not completo and _sin_cambios(entrada, ruta):
+            resultados[relativa] = {"ruta": relativa, "estado": "sin_cambios"}
+        else:
+            copia = None
+            if referencia is not None:
+                copia = os.path.join(referencia, *relativa.split("/"))
+                copia = copia if os.path.exists(copia) else None
+            pendientes.append((ruta, entrada, algoritmo, copia))
+
+    # Los archivos que no hace falta leer salen enseguida; el resto a medida que se verifican, en orden de ruta
+    verificados = _mapear(_verificar_archivo, pendientes, workers)
+    for relativa in sorted(set(entradas) | set(presentes)):
+        if relativa in resultados:
+            yield resultados[relativa]
+        else:
+            yield {"ruta": relativa, **next(verificados)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manifiesto de integridad de un árbol de imágenes.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    construir = subparsers.add_parser("construir", help="Crea o actualiza el manifiesto de un directorio.")
+    construir.add_argument("directorio")
+    construir.add_argument("--manifiesto", required=True, help="Archivo JSON del manifiesto.")
+    construir.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo.")
+    construir.add_argument("--algoritmo", default="sha256", help="Algoritmo de hashlib (ej: sha256, blake2b).")
+    construir.add_argument("--desde-cero", action="store_true",
+                           help="Recalcula todo aunque exista un manifiesto anterior.")
+
+    verificar = subparsers.add_parser("verificar", help="Verifica un directorio contra un manifiesto.")
+    verificar.add_argument("directorio")
+    verificar.add_argument("--manifiesto", required=True, help="Archivo JSON del manifiesto.")
+    verificar.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo.")
+    verificar.add_argument("--referencia", help="Directorio con los originales para graduar diferencias con SSIM.")
+    verificar.add_argument("--completo", action="store_true",
+                           help="Verifica también los archivos sin cambios de tamaño ni fecha.")
+    verificar.add_argument("--todos", action="store_true", help="Incluye en la salida los archivos sin cambios.")
+    verificar.add_argument("--salida", default="-", help="Archivo JSON lines de salida ('-' para stdout).")
+    args = parser.parse_args(argv)
+
+    if args.comando == "construir":
+        anterior = None
+        if not args.desde_cero and os.path.exists(args.manifiesto):
+            anterior = cargar_manifiesto(args.manifiesto)
+        manifiesto = construir_manifiesto(args.directorio, args.workers, args.algoritmo, anterior)
+        guardar_manifiesto(manifiesto, args.manifiesto)
+        print(f"{len(manifiesto['archivos'])} imágenes en {args.manifiesto}", file=sys.stderr)
+        return
+
+    manifiesto = cargar_manifiesto(args.manifiesto)
+    conteos: Dict[str, int] = {}
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        for resultado in verificar_manifiesto(args.directorio, manifiesto, args.workers, args.referencia,
+                                              args.completo):
+            conteos[resultado["estado"]] = conteos.get(resultado["estado"], 0) + 1
+            if args.todos or resultado["estado"] != "sin_cambios":
+                salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                salida.flush()
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    print(", ".join(f"{estado}: {cantidad}" for estado, cantidad in sorted(conteos.items())), file=sys.stderr)
+    # Código de salida distinto de cero si algo no coincide, para usarlo en tareas programadas
+    if any(estado not in ("sin_cambios", "identica") for estado in conteos):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
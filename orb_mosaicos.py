@@ -0,0 +1,91 @@
+from __future__ import annotations
+import math
+from typing import Iterator, List, Optional, Tuple
+from importacion_perezosa import ModuloPerezoso
+
+cv2 = ModuloPerezoso("cv2")
+np = ModuloPerezoso("numpy")
+
+# Lado (en píxeles) de los mosaicos por defecto
+LADO_MOSAICO = 2048
+
+# Margen que se agrega alrededor de cada mosaico al detectar. ORB descarta los keypoints a menos de edgeThreshold
+# (31 px) del borde en cada nivel de su pirámide (8 niveles con escala 1.2), que en el último nivel equivalen a
+# 31 * 1.2^7 ≈ 111 px de la imagen; con este margen los keypoints de la zona propia del mosaico no se pierden por
+# estar cerca del corte
+MARGEN_MOSAICO = 128
+
+# Keypoints que se le piden a ORB por mosaico como mínimo: ORB reparte el pedido entre los niveles de la pirámide y
+# con pedidos muy chicos los niveles gruesos quedan vacíos. Después se conservan solo los del presupuesto
+MINIMO_DETECCION = 100
+
+Rectangulo = Tuple[int, int, int, int]
+
+
+def _cortes(longitud: int, lado: int) -> List[int]:
+    # Cortes parejos: todos los mosaicos de una fila (o columna) tienen casi el mismo tamaño, sin uno chico al final
+    partes = max(1, math.ceil(longitud / lado))
+    return [round(i * longitud / partes) for i in range(partes + 1)]
+
+
+def mosaicos(alto: int, ancho: int, lado: int = LADO_MOSAICO,
+             margen: int = MARGEN_MOSAICO) -> Iterator[Tuple[Rectangulo, Rectangulo]]:
+    """
+    Divide una imagen de alto x ancho en mosaicos de lado x lado como máximo, que la cubren sin superponerse.
+    :return: Por mosaico, fila por fila, (x0, y0, x1, y1) de su zona propia y de la zona a procesar, que es la propia
+    más el margen (recortado a los bordes de la imagen).
+    """
+    cortesX = _cortes(ancho, lado)
+    cortesY = _cortes(alto, lado)
+    for y0, y1 in zip(cortesY, cortesY[1:]):
+        for x0, x1 in zip(cortesX, cortesX[1:]):
+            yield (x0, y0, x1, y1), (max(0, x0 - margen), max(0, y0 - margen),
+                                     min(ancho, x1 + margen), min(alto, y1 + margen))
+
+
+def detectar_ORB_mosaicos(imagen: np.ndarray, limiteCaracteristicas: int = 1000, ladoMosaico: int = LADO_MOSAICO,
+                          margen: int = MARGEN_MOSAICO,
+                          caracteristicasPorMosaico: Optional[int] = None) -> Tuple[tuple, Optional[np.ndarray]]:
+    """
+    Detecta los puntos clave ORB de una imagen en escala de grises recorriéndola por mosaicos (ver mosaicos()).
+
+    Sobre la imagen completa, ORB arma su pirámide y sus buffers del tamaño de toda la imagen (en una de 100
+    megapíxeles son varios cientos de MB además de la imagen) y se queda con los limiteCaracteristicas keypoints de
+    mayor respuesta, que tienden a concentrarse en la zona con más textura. Acá se procesa un mosaico por vez, sobre
+    una vista de la imagen sin copiarla, así que la memoria extra no depende del tamaño de la imagen sino del de un
+    mosaico; y cada mosaico aporta como máximo su parte del presupuesto, lo que reparte los keypoints por toda la
+    imagen.
+    Cada mosaico se procesa con su margen para que los keypoints cercanos al corte se detecten y se describan igual
+    que en la imagen completa, pero solo se conservan los que caen en su zona propia, así que un mismo punto no
+    aparece dos veces. Las coordenadas de los keypoints son de la imagen completa, con lo que sirven para comparar y
+    para cv2.drawMatches igual que los de detectar_ORB.
+    :param limiteCaracteristicas: Total aproximado de keypoints, repartido en partes iguales entre los mosaicos.
+    :param caracteristicasPorMosaico: Si se indica, reemplaza al reparto de limiteCaracteristicas.
+    :return: Tupla (keypoints, descriptores) como la de detectAndCompute (descriptores None si no hay keypoints).
+    """
+    alto, ancho = imagen.shape[:2]
+    zonas = list(mosaicos(alto, ancho, ladoMosaico, margen))
+    presupuesto = caracteristicasPorMosaico or math.ceil(limiteCaracteristicas / len(zonas))
+    orb = cv2.ORB_create(max(presupuesto, MINIMO_DETECCION))
+
+    keypoints = []
+    descriptores = []
+    for (x0, y0, x1, y1), (mx0, my0, mx1, my1) in zonas:
+        kp, des = orb.detectAndCompute(imagen[my0:my1, mx0:mx1], None)
+        if des is None:
+            continue
+        propios = [i for i, k in enumerate(kp)
+                   if x0 <= k.pt[0] + mx0 < x1 and y0 <= k.pt[1] + my0 < y1]
+        propios.sort(key=lambda i: kp[i].response, reverse=True)
+        propios = propios[:presupuesto]
+        if not propios:
+            continue
+        for i in propios:
+            k = kp[i]
+            keypoints.append(cv2.KeyPoint(k.pt[0] + mx0, k.pt[1] + my0, k.size, k.angle, k.response, k.octave,
+                                          k.class_id))
+        descriptores.append(des[propios])
+
+    if not descriptores:
+        return (), None
+    return tuple(keypoints), np.vstack(descriptores)
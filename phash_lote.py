@@ -0,0 +1,110 @@
+from __future__ import annotations
+from typing import Iterable, Optional, Sequence
+from importacion_perezosa import ModuloPerezoso
+
+np = ModuloPerezoso("numpy")
+imagehash = ModuloPerezoso("imagehash")
+Image = ModuloPerezoso("PIL.Image")
+
+# Mismos parámetros que imagehash.phash por defecto: miniatura de 32x32 y hash de 8x8 bits
+TAMANO_HASH = 8
+LADO_MINIATURA = TAMANO_HASH * 4
+
+# Un coeficiente a menos de esta fracción del mayor coeficiente de su imagen se considera empatado con la mediana
+TOLERANCIA_EMPATE = 1e-9
+
+_matrizDCT = None
+
+
+def _matriz_dct() -> np.ndarray:
+    """
+    Primeras TAMANO_HASH filas de la matriz de la DCT tipo II sin normalizar (la de scipy.fftpack.dct):
+    D[k, n] = 2 * cos(pi * k * (2n + 1) / (2N)).
+    """
+    global _matrizDCT
+    if _matrizDCT is None:
+        k = np.arange(TAMANO_HASH)[:, None]
+        n = np.arange(LADO_MINIATURA)[None, :]
+        _matrizDCT = 2 * np.cos(np.pi * k * (2 * n + 1) / (2 * LADO_MINIATURA))
+    return _matrizDCT
+
+
+def miniatura_phash(imagen: Image.Image) -> np.ndarray:
+    """
+    Miniatura de LADO_MINIATURA x LADO_MINIATURA en escala de grises (uint8), igual a la que arma imagehash.phash.
+    """
+    return np.asarray(imagen.convert("L").resize((LADO_MINIATURA, LADO_MINIATURA), Image.LANCZOS))
+
+
+def phash_miniaturas(miniaturas: np.ndarray) -> np.ndarray:
+    """
+    pHash de un lote de miniaturas (N, 32, 32), en una sola pasada vectorizada.
+
+    La DCT 2-D se hace como dos productos de matrices sobre todo el lote (D @ X @ D.T, solo con las 8 filas de baja
+    frecuencia de D), se compara cada coeficiente del bloque de 8x8 con la mediana de su imagen y los 64 bits se
+    empaquetan en un uint64 con el mismo orden que el hexadecimal de imagehash.
+    El resultado es el mismo bit a bit que imagehash.phash: el producto de matrices puede diferir de la DCT de SciPy
+    en el último decimal, lo que solo cambia un bit si un coeficiente está prácticamente empatado con la mediana (ej:
+    imágenes lisas, donde muchos coeficientes son 0). Esas imágenes se detectan y se recalculan con scipy.fftpack,
+    como lo hace imagehash; SciPy se importa solo si aparece alguna.
+    :return: Array uint64 con un hash por miniatura.
+    """
+    pixeles = np.asarray(miniaturas, dtype=np.float64)
+    if pixeles.ndim != 3 or pixeles.shape[1:] != (LADO_MINIATURA, LADO_MINIATURA):
+        raise ValueError(f"Se esperaba un array (N, {LADO_MINIATURA}, {LADO_MINIATURA}): {pixeles.shape}")
+    matriz = _matriz_dct()
+    bajas = matriz @ pixeles @ matriz.T
+    planas = bajas.reshape(len(bajas), -1)
+    medianas = np.median(planas, axis=1, keepdims=True)
+
+    tolerancia = TOLERANCIA_EMPATE * np.abs(planas).max(axis=1, keepdims=True)
+    dudosas = np.flatnonzero((np.abs(planas - medianas) <= tolerancia).any(axis=1))
+    if len(dudosas):
+        import scipy.fftpack
+        dct = scipy.fftpack.dct(scipy.fftpack.dct(np.asarray(miniaturas)[dudosas], axis=1), axis=2)
+        planas[dudosas] = dct[:, :TAMANO_HASH, :TAMANO_HASH].reshape(len(dudosas), -1)
+        medianas[dudosas] = np.median(planas[dudosas], axis=1, keepdims=True)
+
+    bits = planas > medianas
+    # packbits deja el primer coeficiente en el bit más significativo, como el hexadecimal de imagehash
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def phash_imagenes(imagenes: Iterable[Image.Image]) -> np.ndarray:
+    """
+    pHash de varias imágenes PIL: cada una se reduce a su miniatura y todas se procesan juntas.
+    :return: Array uint64 con un hash por imagen.
+    """
+    miniaturas = [miniatura_phash(imagen) for imagen in imagenes]
+    if not miniaturas:
+        return np.zeros(0, dtype=np.uint64)
+    return phash_miniaturas(np.stack(miniaturas))
+
+
+def leer_miniatura(path: str, ladoBorrador: Optional[int] = None) -> np.ndarray:
+    """
+    Lee una imagen y devuelve su miniatura para el pHash.
+    :param ladoBorrador: Si se indica, se usa draft() de PIL para decodificar los JPEG a escala reducida, conservando
+    al menos ese lado.
+    """
+    with Image.open(path) as imagen:
+        if ladoBorrador:
+            imagen.draft("L", (ladoBorrador, ladoBorrador))
+        return miniatura_phash(imagen)
+
+
+def phash_rutas(paths: Sequence[str], ladoBorrador: Optional[int] = None) -> np.ndarray:
+    """
+    pHash de un lote de archivos. Lanza la excepción del primer archivo que no se pueda leer.
+    :return: Array uint64 con un hash por ruta.
+    """
+    if not paths:
+        return np.zeros(0, dtype=np.uint64)
+    return phash_miniaturas(np.stack([leer_miniatura(path, ladoBorrador) for path in paths]))
+
+
+def phash(imagen: Image.Image) -> imagehash.ImageHash:
+    """
+    Reemplazo de imagehash.phash para una imagen (mismo resultado) que no necesita SciPy.
+    """
+    return imagehash.hex_to_hash(f"{int(phash_imagenes([imagen])[0]):016x}")
@@ -0,0 +1,142 @@
+from __future__ import annotations
+from typing import Optional, Tuple, Union
+from importacion_perezosa import ModuloPerezoso
+
+cv2 = ModuloPerezoso("cv2")
+np = ModuloPerezoso("numpy")
+Image = ModuloPerezoso("PIL.Image")
+
+# Constantes de SSIM (Wang et al. 2004), las mismas que usa skimage.metrics.structural_similarity
+K1 = 0.01
+K2 = 0.03
+
+# Lado mayor (en píxeles) al que se reducen las imágenes para calcular el SSIM. Reducir más acelera, pero sube un
+# poco el índice de las imágenes con ruido o compresión fuerte y puede cambiar el veredicto cerca de los umbrales.
+LADO_ANALISIS_SSIM = 2048
+
+
+def tamano_analisis(tamano: Tuple[int, int], ladoAnalisis: Optional[int]) -> Tuple[int, int]:
+    """
+    Tamaño (ancho, alto) al que se reduce una imagen para que su lado mayor no supere ladoAnalisis.
+    Nunca se agranda; con ladoAnalisis=None se usa el tamaño original.
+    """
+    ancho, alto = tamano
+    if not ladoAnalisis or max(ancho, alto) <= ladoAnalisis:
+        return ancho, alto
+    escala = ladoAnalisis / max(ancho, alto)
+    return max(1, round(ancho * escala)), max(1, round(alto * escala))
+
+
+def leer_gris(ruta: str, tamano: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Lee la imagen en escala de grises ("L" de PIL) redimensionada a tamano (ancho, alto).
+    draft() hace que los JPEG grandes se decodifiquen directamente a escala reducida cuando alcanza.
+    """
+    with Image.open(ruta) as img:
+        if tamano is not None:
+            img.draft("L", tamano)
+        img = img.convert("L")
+        if tamano is not None and img.size != tuple(tamano):
+            img = img.resize(tamano, Image.LANCZOS)
+        return np.asarray(img)
+
+
+def _ssim_filas(x: np.ndarray, y: np.ndarray, ventana: int, C1: float, C2: float, normalizacion: float) -> np.ndarray:
+    """
+    Mapa SSIM de un bloque de filas (con el margen de la ventana ya incluido arriba y abajo), en float32 y con
+    filtros de caja separables. Devuelve solo la parte donde la ventana entra completa.
+    """
+    # Los momentos de segundo orden se calculan sobre los valores centrados en 128 para no perder precisión en
+    # float32 al restar dos números grandes y parecidos
+    x = x.astype(np.float32)
+    y = y.astype(np.float32)
+    xc = x - 128
+    yc = y - 128
+    tamanoVentana = (ventana, ventana)
+    ux = cv2.blur(x, tamanoVentana)
+    uy = cv2.blur(y, tamanoVentana)
+    uxc = ux - 128
+    uyc = uy - 128
+    vx = normalizacion * (cv2.blur(xc * xc, tamanoVentana) - uxc * uxc)
+    vy = normalizacion * (cv2.blur(yc * yc, tamanoVentana) - uyc * uyc)
+    vxy = normalizacion * (cv2.blur(xc * yc, tamanoVentana) - uxc * uyc)
+
+    S = ((2 * ux * uy + C1) * (2 * vxy + C2)) / ((ux * ux + uy * uy + C1) * (vx + vy + C2))
+    margen = (ventana - 1) // 2
+    return S[margen:S.shape[0] - margen, margen:S.shape[1] - margen]
+
+
+def ssim(img1: np.ndarray, img2: np.ndarray, ventana: int = 7, rangoDatos: float = 255, filasPorBloque: int = 256,
+         umbrales: Optional[Tuple[float, ...]] = None, mapa: bool = False) -> Union[float, Tuple[float, np.ndarray]]:
+    """
+    Índice SSIM medio entre dos imágenes en escala de grises del mismo tamaño.
+
+    Equivale a skimage.metrics.structural_similarity con sus valores por defecto (ventana uniforme de 7x7, covarianza
+    muestral y promedio sin los bordes donde la ventana no entra), pero calcula en float32, con filtros de caja de
+    OpenCV y por bloques de filas, así la memoria extra es proporcional a filasPorBloque x ancho y no al tamaño de la
+    imagen. El mapa SSIM completo solo se arma si se pide.
+    :param ventana: Lado de la ventana (impar).
+    :param rangoDatos: Rango de los valores de píxel (255 para imágenes de 8 bits).
+    :param filasPorBloque: Filas del mapa que se calculan a la vez.
+    :param umbrales: Si se indican (ej: (0.75, 0.95)), se deja de calcular apenas el resultado ya no puede cruzar
+    ninguno de los umbrales aunque los bloques que faltan tengan el SSIM más alto o más bajo posible (1 o -1). En ese
+    caso se devuelve el promedio parcial, que cae del mismo lado de cada umbral que el valor exacto pero no es el
+    valor exacto: solo sirve para clasificar, no para mostrar. No se usa si se pide el mapa.
+    :param mapa: Si es True devuelve (ssim, mapa SSIM) en lugar de solo el índice.
+    """
+    if img1.shape != img2.shape:
+        raise ValueError(f"Las imágenes deben tener el mismo tamaño: {img1.shape} y {img2.shape}")
+    if ventana % 2 == 0 or min(img1.shape[:2]) < ventana:
+        raise ValueError(f"La ventana debe ser impar y no mayor que la imagen: {ventana}")
+
+    C1 = (K1 * rangoDatos) ** 2
+    C2 = (K2 * rangoDatos) ** 2
+    n = ventana * ventana
+    normalizacion = n / (n - 1)
+    radio = (ventana - 1) // 2
+
+    # Filas del mapa recortado (sin los bordes) y su división en bloques
+    filasMapa = img1.shape[0] - 2 * radio
+    columnasMapa = img1.shape[1] - 2 * radio
+    total = filasMapa * columnasMapa
+    mapaSSIM = np.empty((filasMapa, columnasMapa), dtype=np.float32) if mapa else None
+
+    suma = 0.0
+    contados = 0
+    for inicio in range(0, filasMapa, filasPorBloque):
+        fin = min(inicio + filasPorBloque, filasMapa)
+        # Las filas inicio..fin del mapa necesitan la ventana completa: radio filas más arriba y más abajo
+        S = _ssim_filas(img1[inicio:fin + 2 * radio], img2[inicio:fin + 2 * radio], ventana, C1, C2, normalizacion)
+        suma += float(S.sum(dtype=np.float64))
+        contados += S.size
+        if mapa:
+            mapaSSIM[inicio:fin] = S
+            continue
+
+        if umbrales and contados < total:
+            restantes = total - contados
+            # El SSIM de cada píxel está entre -1 y 1: cotas exactas del promedio final
+            minimo = (suma - restantes) / total
+            maximo = (suma + restantes) / total
+            if all(minimo > u or maximo < u for u in umbrales):
+                # minimo > u implica que el promedio parcial también es > u (y lo mismo con maximo < u)
+                return suma / contados
+
+    resultado = suma / total
+    if mapa:
+        return resultado, mapaSSIM
+    return resultado
+
+
+def ssim_imagenes(ruta1: str, ruta2: str, ladoAnalisis: Optional[int] = LADO_ANALISIS_SSIM, **kwargs) -> Union[float, Tuple[float, np.ndarray]]:
+    """
+    SSIM entre dos archivos de imagen. Ambas se leen en escala de grises al tamaño de análisis: el de la primera
+    imagen reducido para que su lado mayor no supere ladoAnalisis (la segunda se lleva a ese mismo tamaño).
+    Trabajar a LADO_ANALISIS_SSIM píxeles en lugar de a resolución completa es mucho más rápido con escaneos grandes
+    y cambia poco el índice, pero no da exactamente el mismo valor; con ladoAnalisis=None se usa la resolución
+    completa.
+    :param kwargs: Parámetros de ssim (umbrales, filasPorBloque, mapa, ...).
+    """
+    with Image.open(ruta1) as img:
+        tamano = tamano_analisis(img.size, ladoAnalisis)
+    return ssim(leer_gris(ruta1, tamano), leer_gris(ruta2, tamano), **kwargs)